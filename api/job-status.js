@@ -49,12 +49,30 @@ export default async function handler(req, res) {
     console.log(`📊 Getting status for job: ${jobId}`);
 
     // Get main job status
-    const { data: job, error: jobError } = await supabase
+    let { data: job, error: jobError } = await supabase
       .from('site_jobs')
       .select('*')
       .eq('id', jobId)
       .single();
 
+    // Finished jobs are moved to site_jobs_archive after ARCHIVE_AFTER_DAYS
+    let archived = false;
+    if (jobError?.code === 'PGRST116') {
+      const { data: archivedJob, error: archiveError } = await supabase
+        .from('site_jobs_archive')
+        .select('*')
+        .eq('id', jobId)
+        .maybeSingle();
+
+      if (archiveError) {
+        console.error('❌ Archived job query error:', archiveError);
+      } else if (archivedJob) {
+        job = archivedJob;
+        jobError = null;
+        archived = true;
+      }
+    }
+
     if (jobError) {
       console.error('❌ Job query error:', jobError);
       
@@ -73,12 +91,14 @@ export default async function handler(req, res) {
       });
     }
 
-    // Get progress steps
-    const { data: progress, error: progressError } = await supabase
-      .from('site_job_progress')
-      .select('*')
-      .eq('job_id', jobId)
-      .order('created_at', { ascending: true });
+    // Get progress steps; archived jobs only keep a per-step summary
+    const { data: progress, error: progressError } = archived
+      ? { data: progressFromSummary(job), error: null }
+      : await supabase
+        .from('site_job_progress')
+        .select('*')
+        .eq('job_id', jobId)
+        .order('created_at', { ascending: true });
 
     if (progressError) {
       console.error('❌ Progress query error:', progressError);
@@ -138,6 +158,7 @@ export default async function handler(req, res) {
       // Metadata
       isRegeneration: job.job_data?.regenerate || false,
       originalRequestData: job.job_data,
+      archived,
       
       timestamp: new Date().toISOString()
     };
@@ -158,6 +179,19 @@ export default async function handler(req, res) {
   }
 }
 
+// Rebuild one final progress entry per step from an archived job's progress_summary
+function progressFromSummary(job) {
+  const summary = job.progress_summary || {};
+  const failedSteps = summary.failed_steps || [];
+  return Object.keys(summary.steps || {}).map(step => ({
+    step_name: step,
+    status: failedSteps.includes(step) ? 'failed' : 'completed',
+    progress_percentage: failedSteps.includes(step) ? null : 100,
+    message: null,
+    created_at: job.completed_at
+  }));
+}
+
 function getEstimatedTime(status, progress) {
   if (status === 'completed' || status === 'failed') {
     return 0;
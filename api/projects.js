@@ -30,6 +30,21 @@ export default async function handler(req, res) {
 
     if (jobsError) throw new Error(`Jobs query failed: ${jobsError.message}`);
 
+    // Finished jobs older than ARCHIVE_AFTER_DAYS are moved to site_jobs_archive by the worker
+    if (jobs.length < 100) {
+      const { data: archived, error: archiveError } = await supabase
+        .from('site_jobs_archive')
+        .select('id, domain, status, result_data, error_message, created_at, started_at, completed_at')
+        .order('created_at', { ascending: false })
+        .limit(100 - jobs.length);
+
+      if (archiveError) {
+        console.warn('Archived jobs query failed, continuing without them:', archiveError.message);
+      } else {
+        jobs.push(...archived);
+      }
+    }
+
     const { data: sites, error: sitesError } = await supabase
       .from('sites')
       .select('domain, deployed_url, paid')
@@ -94,17 +109,22 @@ export default async function handler(req, res) {
   }
 }
 
+async function findJob(table, id, domain) {
+  let query = supabase.from(table).select('*');
+  if (id) {
+    query = query.eq('id', id);
+  } else if (domain) {
+    query = query.eq('domain', domain).order('created_at', { ascending: false }).limit(1);
+  }
+  const { data: job, error } = await query.maybeSingle();
+  return error ? null : job;
+}
+
 async function handleSingleProject(req, res, id, domain) {
   try {
-    let query = supabase.from('site_jobs').select('*');
-    if (id) {
-      query = query.eq('id', id);
-    } else if (domain) {
-      query = query.eq('domain', domain).order('created_at', { ascending: false });
-    }
-    
-    const { data: job, error } = await query.single();
-    if (error || !job) return res.status(404).json({ error: 'Project not found' });
+    // Fall back to the archive for finished jobs moved out of site_jobs
+    const job = (await findJob('site_jobs', id, domain)) || (await findJob('site_jobs_archive', id, domain));
+    if (!job) return res.status(404).json({ error: 'Project not found' });
     
     // This logic can be simplified as it largely duplicates the main function
     // For now, return the job data directly
@@ -128,6 +148,8 @@ async function handleDeleteProject(req, res) {
         console.log(`🗑️ Deleting job: ${id}`);
         const { error } = await supabase.from('site_jobs').delete().eq('id', id);
         if (error) throw error;
+        const { error: archiveError } = await supabase.from('site_jobs_archive').delete().eq('id', id);
+        if (archiveError) throw archiveError;
         
         console.log(`✅ Job deleted: ${id}`);
         return res.status(200).json({ success: true, message: 'Project deleted' });
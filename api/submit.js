@@ -88,6 +88,9 @@ export default async function handler(req, res) {
       timestamp: new Date().toISOString()
     };
 
+    // A resubmission supersedes the user's unfinished jobs for the same domain
+    await cancelSupersededJobs(targetDomain, userId);
+
     // Enqueue the job using our working custom function
     const { data: result, error } = await supabase.rpc('enqueue_site_generation', {
       p_domain: targetDomain,
@@ -142,6 +145,33 @@ export default async function handler(req, res) {
   }
 }
 
+// Cancel queued or running jobs for a domain so workers stop spending slots on them
+// (see supabase/job-cancellation-schema.sql); failures never block the new submission
+async function cancelSupersededJobs(domain, userId) {
+  try {
+    let query = supabase
+      .from('site_jobs')
+      .select('id')
+      .eq('domain', domain)
+      .in('status', ['queued', 'processing']);
+    query = userId ? query.eq('user_id', userId) : query.is('user_id', null);
+
+    const { data: jobs, error } = await query;
+    if (error) throw error;
+
+    for (const job of jobs || []) {
+      const { error: cancelError } = await supabase.rpc('cancel_site_job', {
+        p_job_id: job.id,
+        p_reason: 'Superseded by a newer submission'
+      });
+      if (cancelError) throw cancelError;
+      console.log(`🛑 Cancelled superseded job: ${job.id}`);
+    }
+  } catch (error) {
+    console.error('Failed to cancel superseded jobs:', error.message);
+  }
+}
+
 // Function to trigger background job processing
 async function triggerJobProcessing() {
   try {
@@ -0,0 +1,37 @@
+-- Bulk Ingestion - Enqueue many site generation jobs in one call
+-- Used by worker/ingest.py; skips domains that already have a queued, running or completed job,
+-- including completed jobs moved to site_jobs_archive (apply job-maintenance-schema.sql first)
+
+CREATE OR REPLACE FUNCTION enqueue_site_generation_batch(
+  p_jobs JSONB,                -- [{"domain": "...", "user_id": "...", "job_data": {...}}, ...]
+  p_priority INTEGER DEFAULT 0
+)
+RETURNS TABLE(inserted INTEGER, skipped INTEGER) AS $$
+DECLARE
+  v_total INTEGER;
+  v_inserted INTEGER;
+BEGIN
+  v_total := jsonb_array_length(p_jobs);
+
+  INSERT INTO site_jobs (domain, user_id, job_data, priority)
+  SELECT DISTINCT ON (j->>'domain')
+    j->>'domain',
+    NULLIF(j->>'user_id', '')::UUID,
+    COALESCE(j->'job_data', '{}'::jsonb),
+    p_priority
+  FROM jsonb_array_elements(p_jobs) AS j
+  WHERE NOT EXISTS (
+    SELECT 1 FROM site_jobs s
+    WHERE s.domain = j->>'domain'
+    AND s.status IN ('queued', 'processing', 'completed')
+  )
+  AND NOT EXISTS (
+    SELECT 1 FROM site_jobs_archive a
+    WHERE a.domain = j->>'domain'
+    AND a.status = 'completed'
+  );
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN QUERY SELECT v_inserted, v_total - v_inserted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
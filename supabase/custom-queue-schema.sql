@@ -141,6 +141,8 @@ END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
 -- Function to dequeue the next available job
+-- (dropped first because the returned columns changed; re-run this block on existing databases)
+DROP FUNCTION IF EXISTS dequeue_next_job(TEXT);
 CREATE OR REPLACE FUNCTION dequeue_next_job(
   p_worker_id TEXT
 )
@@ -148,7 +150,9 @@ RETURNS TABLE(
   job_id UUID,
   domain TEXT,
   job_data JSONB,
-  user_id UUID
+  user_id UUID,
+  job_created_at TIMESTAMP WITH TIME ZONE,
+  job_priority INTEGER
 ) AS $$
 DECLARE
   v_job_record RECORD;
@@ -179,7 +183,9 @@ BEGIN
       v_job_record.id,
       v_job_record.domain,
       v_job_record.job_data,
-      v_job_record.user_id;
+      v_job_record.user_id,
+      v_job_record.created_at,
+      v_job_record.priority;
   END IF;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -211,6 +217,20 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Function to merge stage results into a job as they are produced
+CREATE OR REPLACE FUNCTION merge_job_result(
+  p_job_id UUID,
+  p_result JSONB
+)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE site_jobs
+  SET result_data = COALESCE(result_data, '{}'::jsonb) || p_result
+  WHERE id = p_job_id
+  AND status <> 'cancelled';
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
 -- Function to mark job as completed
 CREATE OR REPLACE FUNCTION complete_job(
   p_job_id UUID,
@@ -255,6 +275,36 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Function to hand a job back to the queue when its worker stops before finishing it
+-- (fails it instead once it has used up its attempts); only the claiming worker can release it
+CREATE OR REPLACE FUNCTION release_job(
+  p_job_id UUID,
+  p_worker_id TEXT,
+  p_reason TEXT
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+  UPDATE site_jobs 
+  SET 
+    status = CASE 
+      WHEN attempts >= max_attempts THEN 'failed'
+      ELSE 'queued'
+    END,
+    error_message = p_reason,
+    completed_at = CASE 
+      WHEN attempts >= max_attempts THEN NOW()
+      ELSE NULL
+    END,
+    started_at = NULL,
+    worker_id = NULL
+  WHERE id = p_job_id
+  AND status = 'processing'
+  AND worker_id = p_worker_id;
+
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
 -- Function to get queue stats
 CREATE OR REPLACE FUNCTION get_queue_stats()
 RETURNS TABLE(
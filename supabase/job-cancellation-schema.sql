@@ -0,0 +1,29 @@
+-- Job Cancellation - Adds a 'cancelled' status to site_jobs
+-- Workers watch their in-flight jobs for this status and stop processing them
+
+-- Allow the 'cancelled' status
+ALTER TABLE site_jobs DROP CONSTRAINT IF EXISTS site_jobs_status_check;
+ALTER TABLE site_jobs ADD CONSTRAINT site_jobs_status_check
+  CHECK (status IN ('queued', 'processing', 'completed', 'failed', 'cancelled'));
+
+-- Function to cancel a queued or running job (e.g. when a user abandons or resubmits a project)
+CREATE OR REPLACE FUNCTION cancel_site_job(
+  p_job_id UUID,
+  p_reason TEXT DEFAULT 'Cancelled by user'
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  UPDATE site_jobs
+  SET
+    status = 'cancelled',
+    error_message = p_reason,
+    completed_at = NOW()
+  WHERE id = p_job_id
+  AND status IN ('queued', 'processing');
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated > 0;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
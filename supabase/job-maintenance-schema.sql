@@ -0,0 +1,156 @@
+-- Job Maintenance - Moves finished jobs out of the hot queue tables
+-- A single leader-elected worker (see worker/maintenance.py) calls archive_finished_jobs periodically
+
+-- Cold storage for finished jobs; progress rows are collapsed into progress_summary
+CREATE TABLE IF NOT EXISTS site_jobs_archive (
+  id UUID PRIMARY KEY,
+  domain TEXT NOT NULL,
+  user_id UUID,
+  status TEXT NOT NULL,
+  job_data JSONB,
+  result_data JSONB,
+  error_message TEXT,
+  worker_id TEXT,
+  priority INTEGER,
+  attempts INTEGER,
+  created_at TIMESTAMP WITH TIME ZONE,
+  started_at TIMESTAMP WITH TIME ZONE,
+  completed_at TIMESTAMP WITH TIME ZONE,
+  progress_summary JSONB,
+  archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_site_jobs_archive_domain ON site_jobs_archive(domain);
+CREATE INDEX IF NOT EXISTS idx_site_jobs_archive_user ON site_jobs_archive(user_id, created_at DESC);
+
+-- Same read access as site_jobs; rows are only written by archive_finished_jobs and
+-- removed by the service role (which bypasses RLS)
+ALTER TABLE site_jobs_archive ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own archived jobs" ON site_jobs_archive;
+CREATE POLICY "Users can view their own archived jobs" ON site_jobs_archive
+  FOR SELECT USING (true); -- Allow public for now, as for site_jobs
+
+-- Finished-job scan used by the archiver
+CREATE INDEX IF NOT EXISTS idx_site_jobs_finished ON site_jobs(created_at)
+  WHERE status IN ('completed', 'failed', 'cancelled');
+
+-- sites.job_id would be nulled when a job moves to the archive; keep the id so it
+-- resolves against site_jobs_archive instead
+ALTER TABLE sites DROP CONSTRAINT IF EXISTS sites_job_id_fkey;
+
+-- Named leases so only one worker runs a periodic task at a time
+CREATE TABLE IF NOT EXISTS worker_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- No policies: only the service role and the lease functions below can touch leases
+ALTER TABLE worker_leases ENABLE ROW LEVEL SECURITY;
+
+-- Take or renew a lease; succeeds if it is free, expired or already ours
+CREATE OR REPLACE FUNCTION acquire_worker_lease(
+  p_name TEXT,
+  p_holder TEXT,
+  p_ttl_seconds INTEGER
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+  INSERT INTO worker_leases (name, holder, expires_at)
+  VALUES (p_name, p_holder, NOW() + (p_ttl_seconds || ' seconds')::INTERVAL)
+  ON CONFLICT (name) DO UPDATE
+  SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+  WHERE worker_leases.holder = p_holder OR worker_leases.expires_at < NOW();
+
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Give up a lease early (e.g. on shutdown) so another worker can take over
+CREATE OR REPLACE FUNCTION release_worker_lease(
+  p_name TEXT,
+  p_holder TEXT
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+  DELETE FROM worker_leases WHERE name = p_name AND holder = p_holder;
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Archive one batch of finished jobs older than p_older_than_days.
+-- Returns how many jobs and progress rows were moved; a full batch means more remain.
+CREATE OR REPLACE FUNCTION archive_finished_jobs(
+  p_older_than_days INTEGER DEFAULT 14,
+  p_batch_size INTEGER DEFAULT 500
+)
+RETURNS TABLE(jobs_archived INTEGER, progress_rows_collapsed INTEGER) AS $$
+DECLARE
+  v_ids UUID[];
+  v_progress_rows INTEGER;
+BEGIN
+  SELECT array_agg(id) INTO v_ids
+  FROM (
+    SELECT id FROM site_jobs
+    WHERE status IN ('completed', 'failed', 'cancelled')
+    AND created_at < NOW() - (p_older_than_days || ' days')::INTERVAL
+    ORDER BY created_at
+    LIMIT p_batch_size
+    FOR UPDATE SKIP LOCKED
+  ) batch;
+
+  IF v_ids IS NULL THEN
+    RETURN QUERY SELECT 0, 0;
+    RETURN;
+  END IF;
+
+  SELECT COUNT(*) INTO v_progress_rows FROM site_job_progress WHERE job_id = ANY(v_ids);
+
+  INSERT INTO site_jobs_archive (
+    id, domain, user_id, status, job_data, result_data, error_message, worker_id,
+    priority, attempts, created_at, started_at, completed_at, progress_summary
+  )
+  SELECT
+    j.id, j.domain, j.user_id, j.status, j.job_data, j.result_data, j.error_message, j.worker_id,
+    j.priority, j.attempts, j.created_at, j.started_at, j.completed_at,
+    (
+      -- Seconds spent in each step plus the final progress entry
+      SELECT jsonb_build_object(
+        'rows', SUM(s.rows),
+        'steps', jsonb_object_agg(s.step_name, s.seconds),
+        'failed_steps', COALESCE(jsonb_agg(s.step_name) FILTER (WHERE s.failed), '[]'::jsonb),
+        'last_message', (
+          SELECT p.message FROM site_job_progress p
+          WHERE p.job_id = j.id ORDER BY p.created_at DESC LIMIT 1
+        )
+      )
+      FROM (
+        SELECT
+          step_name,
+          COUNT(*) AS rows,
+          ROUND(EXTRACT(EPOCH FROM MAX(created_at) - MIN(created_at))::NUMERIC, 1) AS seconds,
+          BOOL_OR(status = 'failed') AS failed
+        FROM site_job_progress
+        WHERE job_id = j.id
+        GROUP BY step_name
+      ) s
+    )
+  FROM site_jobs j
+  WHERE j.id = ANY(v_ids)
+  ON CONFLICT (id) DO NOTHING;
+
+  -- Progress rows go with their jobs (ON DELETE CASCADE)
+  DELETE FROM site_jobs WHERE id = ANY(v_ids);
+
+  RETURN QUERY SELECT array_length(v_ids, 1), v_progress_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only workers (service role) may take leases or archive; functions are executable by PUBLIC by default
+REVOKE EXECUTE ON FUNCTION acquire_worker_lease(TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION release_worker_lease(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION archive_finished_jobs(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION acquire_worker_lease(TEXT, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION release_worker_lease(TEXT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION archive_finished_jobs(INTEGER, INTEGER) TO service_role;
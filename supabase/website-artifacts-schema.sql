@@ -0,0 +1,15 @@
+-- Website Artifacts - Optimized, precompressed variants of generated site files
+-- The worker stores minified files plus gzip/brotli variants in website_files after each build
+
+ALTER TABLE website_files ADD COLUMN IF NOT EXISTS content_encoding TEXT DEFAULT 'identity'
+  CHECK (content_encoding IN ('identity', 'gzip', 'br'));
+ALTER TABLE website_files ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE website_files ADD COLUMN IF NOT EXISTS content_type TEXT;
+ALTER TABLE website_files ADD COLUMN IF NOT EXISTS cache_control TEXT;
+ALTER TABLE website_files ADD COLUMN IF NOT EXISTS byte_size INTEGER;
+
+-- Compressed variants are stored base64-encoded in file_content;
+-- serve them with Content-Encoding set to content_encoding
+
+-- Lookup of a file's variants when serving
+CREATE INDEX IF NOT EXISTS idx_website_files_lookup ON website_files(website_id, file_name, content_encoding);
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Admin HTTP API for inspecting and steering a running worker.
+
+Runs inside the worker's event loop on ADMIN_HOST:ADMIN_PORT (loopback by
+default). Every endpoint except the health probes requires ADMIN_TOKEN as a
+bearer token, and is refused outright when no token is configured.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextlib
+from typing import Dict, Any, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigUpdate(BaseModel):
+    concurrency: Optional[int] = Field(None, ge=1)
+    # Requests per second by stage; null or 0 removes the limit
+    rate_limits: Optional[Dict[str, Optional[float]]] = None
+
+
+def create_admin_app(worker, loop_monitor=None, profiler=None) -> FastAPI:
+    """Build the admin API for a SiteGenerationWorker"""
+    admin_token = os.getenv('ADMIN_TOKEN')
+
+    async def check_token(authorization: Optional[str] = Header(None)):
+        if not admin_token:
+            raise HTTPException(status_code=403, detail='Admin API disabled: ADMIN_TOKEN is not set')
+        if authorization != f"Bearer {admin_token}":
+            raise HTTPException(status_code=401, detail='Invalid admin token')
+
+    app = FastAPI(title='DomainToBiz Worker Admin')
+    # Health probes stay open so platform checks work without the token
+    protected = [Depends(check_token)]
+
+    @app.get('/healthz')
+    async def healthz():
+        """Liveness: the event loop answers and the poll loop is not wedged"""
+        poll_age = time.monotonic() - worker.last_poll_at
+        alive = poll_age < worker.poll_stall_timeout
+        body = {'status': 'ok' if alive else 'stalled', 'worker_id': worker.worker_id, 'poll_age_seconds': round(poll_age, 1)}
+        return JSONResponse(body, status_code=200 if alive else 503)
+
+    @app.get('/readyz')
+    async def readyz():
+        """Readiness: the worker is claiming new jobs"""
+        ready = worker.is_running and not worker.draining
+        body = {'ready': ready, 'draining': worker.draining, 'in_flight': len(worker.in_flight)}
+        return JSONResponse(body, status_code=200 if ready else 503)
+
+    @app.get('/jobs', dependencies=protected)
+    async def jobs():
+        return {'jobs': [job.to_dict() for job in worker.in_flight.values()]}
+
+    @app.post('/jobs/{job_id}/cancel', dependencies=protected)
+    async def cancel_job(job_id: str, persist: bool = True):
+        """Cancel an in-flight job; by default also marks its row cancelled"""
+        if job_id not in worker.in_flight:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} is not running on this worker")
+        if persist:
+            worker.mark_job_cancelled(job_id, 'Cancelled via worker admin API')
+        return {'job_id': job_id, 'cancelled': worker.cancel_job(job_id, 'admin request')}
+
+    @app.post('/drain', dependencies=protected)
+    async def drain(timeout: Optional[float] = None, wait: bool = True):
+        """Stop claiming jobs and (optionally) wait for in-flight jobs to finish"""
+        if not wait:
+            worker.draining = True
+            return {'draining': True, 'drained': not worker.in_flight, 'in_flight': len(worker.in_flight)}
+
+        drained = await worker.drain(timeout)
+        return {'draining': True, 'drained': drained, 'in_flight': [job.to_dict() for job in worker.in_flight.values()]}
+
+    @app.post('/resume', dependencies=protected)
+    async def resume():
+        worker.resume()
+        return {'draining': worker.draining}
+
+    @app.get('/config', dependencies=protected)
+    async def get_config():
+        return worker.runtime_config()
+
+    @app.put('/config', dependencies=protected)
+    async def update_config(update: ConfigUpdate):
+        if update.concurrency is not None:
+            worker.set_concurrency(update.concurrency)
+        for stage, rate in (update.rate_limits or {}).items():
+            if rate is not None and rate < 0:
+                raise HTTPException(status_code=422, detail=f"Rate limit for {stage} must not be negative")
+            worker.rate_limiter.set_limit(stage, rate)
+        return worker.runtime_config()
+
+    @app.get('/metrics', dependencies=protected)
+    async def metrics():
+        body: Dict[str, Any] = {'admission': worker.admission.snapshot(worker.in_flight.values()),
+                                'rate_limits': worker.rate_limiter.snapshot(),
+                                'hedging': worker.hedging.snapshot(),
+                                'maintenance': worker.maintenance.snapshot()}
+        if loop_monitor:
+            body['loop_lag'] = loop_monitor.snapshot()
+        return body
+
+    @app.post('/profile', dependencies=protected)
+    async def profile(mode: str = 'cprofile', seconds: Optional[float] = None):
+        """Start an on-demand profile of the live worker"""
+        if not profiler:
+            raise HTTPException(status_code=404, detail='Profiler not enabled')
+        try:
+            return profiler.start(mode, seconds)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return app
+
+
+class _EmbeddedServer(uvicorn.Server):
+    """uvicorn server that leaves signal handling to the worker"""
+
+    def install_signal_handlers(self):  # uvicorn < 0.29
+        pass
+
+    @contextlib.contextmanager
+    def capture_signals(self):  # uvicorn >= 0.29
+        yield
+
+
+class AdminServer:
+    """Serves the admin API as a task on the worker's event loop"""
+
+    def __init__(self, worker, loop_monitor=None, profiler=None, host: str = None, port: int = None):
+        self.host = host or os.getenv('ADMIN_HOST', '127.0.0.1')
+        self.port = port if port is not None else int(os.getenv('ADMIN_PORT', '8081') or 0)
+        self.app = create_admin_app(worker, loop_monitor, profiler)
+        self.server: Optional[_EmbeddedServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.port:
+            logger.info("🔌 Admin API disabled (ADMIN_PORT not set)")
+            return
+
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level='warning', access_log=False)
+        self.server = _EmbeddedServer(config)
+        self._task = asyncio.create_task(self.server.serve(), name='admin-api')
+        logger.info(f"🔌 Admin API listening on {self.host}:{self.port}")
+        if not os.getenv('ADMIN_TOKEN'):
+            logger.warning("⚠️ ADMIN_TOKEN not set: only the health probes are served")
+
+    async def stop(self):
+        if self.server and self._task:
+            self.server.should_exit = True
+            await self._task
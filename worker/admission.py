@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Memory-aware admission control for concurrent jobs.
+
+The worker only claims a new job when it is below its concurrency limit and the
+process has enough headroom under the memory watermark for one more job.
+"""
+
+import os
+import sys
+import logging
+import resource
+from typing import Dict, Any, Iterable, Tuple
+
+from jobs import InFlightJob
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def get_rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No /proc: fall back to peak RSS (reported in bytes on macOS, kilobytes elsewhere)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class AdmissionController:
+    """
+    Decides whether the worker may claim another job.
+
+    Each in-flight job is expected to grow to `expected_job_bytes` (the larger of
+    JOB_MEMORY_RESERVE_MB and a moving average of observed job peaks). Headroom
+    still reserved for jobs that have not reached that size is subtracted from the
+    budget, so a burst of claims cannot overshoot the watermark.
+    """
+
+    def __init__(self, max_concurrency: int = None, memory_watermark_mb: float = None,
+                 job_reserve_mb: float = None, payload_memory_factor: float = None):
+        self.max_concurrency = max_concurrency or int(os.getenv('WORKER_CONCURRENCY', '4'))
+        self.memory_watermark = int((memory_watermark_mb or float(os.getenv('MEMORY_WATERMARK_MB', '400'))) * MB)
+        self.job_reserve = int((job_reserve_mb or float(os.getenv('JOB_MEMORY_RESERVE_MB', '24'))) * MB)
+        # Decoded JSON takes several times its wire size in Python objects
+        self.payload_memory_factor = payload_memory_factor or float(os.getenv('PAYLOAD_MEMORY_FACTOR', '4'))
+        self.avg_job_peak = 0.0
+        self.jobs_observed = 0
+        self.rejections = 0
+
+    @property
+    def expected_job_bytes(self) -> int:
+        return int(max(self.job_reserve, self.avg_job_peak))
+
+    def job_memory(self, job: InFlightJob) -> int:
+        """Estimated memory held by a job's stage payloads"""
+        return int(job.payload_bytes * self.payload_memory_factor)
+
+    def budget_bytes(self, in_flight: Iterable[InFlightJob]) -> int:
+        """Memory still available for new jobs after current RSS and in-flight reservations"""
+        outstanding = sum(max(0, self.expected_job_bytes - self.job_memory(job)) for job in in_flight)
+        return self.memory_watermark - get_rss_bytes() - outstanding
+
+    def can_admit(self, in_flight: Iterable[InFlightJob]) -> Tuple[bool, str]:
+        """Return (admit, reason) for claiming one more job"""
+        in_flight = list(in_flight)
+        if len(in_flight) >= self.max_concurrency:
+            return False, f"concurrency limit reached ({len(in_flight)}/{self.max_concurrency})"
+
+        budget = self.budget_bytes(in_flight)
+        if budget < self.expected_job_bytes:
+            self.rejections += 1
+            return False, f"memory budget exhausted ({budget / MB:.0f}MB free, {self.expected_job_bytes / MB:.0f}MB needed)"
+
+        return True, 'ok'
+
+    def record_job_finished(self, job: InFlightJob):
+        """Fold a finished job's peak payload into the per-job estimate"""
+        peak = job.peak_payload_bytes * self.payload_memory_factor
+        self.jobs_observed += 1
+        if self.jobs_observed == 1:
+            self.avg_job_peak = peak
+        else:
+            self.avg_job_peak = 0.8 * self.avg_job_peak + 0.2 * peak
+
+    def snapshot(self, in_flight: Iterable[InFlightJob]) -> Dict[str, Any]:
+        """Current memory budget as metrics"""
+        in_flight = list(in_flight)
+        return {
+            'in_flight': len(in_flight),
+            'max_concurrency': self.max_concurrency,
+            'rss_mb': round(get_rss_bytes() / MB, 1),
+            'memory_watermark_mb': round(self.memory_watermark / MB, 1),
+            'memory_budget_mb': round(self.budget_bytes(in_flight) / MB, 1),
+            'expected_job_mb': round(self.expected_job_bytes / MB, 1),
+            'in_flight_payload_mb': round(sum(self.job_memory(job) for job in in_flight) / MB, 1),
+            'admission_rejections': self.rejections
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Per-job deadlines and deadline-aware stage timeouts.
+
+Every job gets an overall deadline, counted from when it was submitted. What is left
+of the budget is split across the remaining stages in proportion to their nominal
+timeouts, so a slow early stage cannot starve the later ones, with each stage's
+minimum kept as a floor. A job that can no longer fit its remaining stages is
+failed immediately instead of holding a slot.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages that call the agent API, in execution order
+STAGE_ORDER = ['analyze', 'strategy', 'design', 'content', 'build']
+
+# Minimum time a stage needs to have a realistic chance of succeeding
+DEFAULT_STAGE_MIN_SECONDS = {'analyze': 10, 'strategy': 15, 'design': 10, 'content': 15, 'build': 30}
+
+# Nominal request timeout of each stage (as passed to post_stage in main.py)
+DEFAULT_STAGE_TIMEOUTS = {'analyze': 120, 'strategy': 120, 'design': 120, 'content': 120, 'build': 300}
+
+
+class DeadlineExceeded(Exception):
+    """The job cannot finish its remaining stages before its deadline"""
+
+
+def _parse_seconds_map(spec: str) -> Dict[str, float]:
+    values = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, seconds = item.partition('=')
+        try:
+            values[key.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring invalid deadline setting: {item}")
+    return values
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        logger.warning(f"⚠️ Could not parse timestamp: {value}")
+        return None
+
+
+def _parse_budget(value: Any) -> Optional[float]:
+    if value in (None, ''):
+        return None
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        budget = None
+    if budget is None or budget <= 0:
+        logger.warning(f"⚠️ Ignoring invalid deadlineSeconds: {value!r}, using the default deadline")
+        return None
+    return budget
+
+
+class JobDeadline:
+    """Deadline of a single job, as a wall-clock timestamp"""
+
+    def __init__(self, expires_at: float, stage_min_seconds: Dict[str, float] = None,
+                 stage_timeouts: Dict[str, float] = None):
+        self.expires_at = expires_at
+        self.stage_min_seconds = stage_min_seconds or DEFAULT_STAGE_MIN_SECONDS
+        self.stage_timeouts = stage_timeouts or DEFAULT_STAGE_TIMEOUTS
+
+    @classmethod
+    def for_job(cls, job: Dict[str, Any], plan: Optional[str] = None) -> 'JobDeadline':
+        """
+        Resolve a job's deadline, in order of preference: job_data `deadlineAt`
+        (ISO timestamp), job_data `deadlineSeconds` (from submission), the default
+        for the owner's `plan` (PLAN_DEADLINE_SECONDS), or JOB_DEADLINE_SECONDS.
+        """
+        job_data = job.get('job_data') or {}
+        stage_min_seconds = {**DEFAULT_STAGE_MIN_SECONDS, **_parse_seconds_map(os.getenv('STAGE_MIN_SECONDS', ''))}
+        stage_timeouts = {**DEFAULT_STAGE_TIMEOUTS, **_parse_seconds_map(os.getenv('STAGE_TIMEOUTS', ''))}
+
+        expires_at = _parse_timestamp(job_data.get('deadlineAt'))
+        if expires_at:
+            return cls(expires_at, stage_min_seconds, stage_timeouts)
+
+        budget = _parse_budget(job_data.get('deadlineSeconds'))
+        if budget is None:
+            plan_deadlines = _parse_seconds_map(os.getenv('PLAN_DEADLINE_SECONDS', 'free=900,starter=720,pro=600'))
+            budget = plan_deadlines.get(plan, float(os.getenv('JOB_DEADLINE_SECONDS', '900')))
+
+        submitted_at = _parse_timestamp(job.get('created_at')) or time.time()
+        return cls(submitted_at + budget, stage_min_seconds, stage_timeouts)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.time()
+
+    @staticmethod
+    def _stages_after(stage: str):
+        return STAGE_ORDER[STAGE_ORDER.index(stage) + 1:] if stage in STAGE_ORDER else []
+
+    def reserve_after(self, stage: str) -> float:
+        """Minimum time that must be left for the stages after `stage`"""
+        return sum(self.stage_min_seconds.get(s, 0) for s in self._stages_after(stage))
+
+    def ensure_feasible(self, stage: str):
+        """Raise DeadlineExceeded if `stage` and everything after it cannot fit in the budget"""
+        needed = self.stage_min_seconds.get(stage, 0) + self.reserve_after(stage)
+        remaining = self.remaining()
+        if remaining < needed:
+            raise DeadlineExceeded(f"Deadline exceeded: {max(remaining, 0):.0f}s left, "
+                                   f"{needed:.0f}s needed from stage '{stage}'")
+
+    def stage_timeout(self, stage: str, timeout: float) -> float:
+        """
+        Timeout for a stage request: its own timeout capped by this stage's share of the
+        remaining budget, in proportion to the nominal timeouts of the stages left. The
+        share is raised to the stage's minimum but never eats into later stages' minimums.
+        """
+        self.ensure_feasible(stage)
+        remaining = self.remaining()
+        later_timeouts = sum(self.stage_timeouts.get(s, 0) for s in self._stages_after(stage))
+        share = remaining * timeout / (timeout + later_timeouts)
+        share = max(share, self.stage_min_seconds.get(stage, 0))
+        return min(timeout, share, remaining - self.reserve_after(stage))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'deadline_at': datetime.fromtimestamp(self.expires_at, tz=timezone.utc).isoformat(),
+            'remaining_seconds': round(self.remaining(), 1)
+        }
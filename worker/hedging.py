@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Request hedging for slow idempotent stages.
+
+If a stage request has not answered by a percentile of that stage's recent
+latency, a second identical request is sent and whichever answers first wins.
+Stages listed in HEDGE_STAGES are hedged, limited to HEDGEABLE_STAGES:
+/api/analyze and /api/agents/design are idempotent (a duplicate analyze call
+only adds an extra domain_analyses log row), while the other stages write rows
+and must never be sent twice. A shared budget caps hedges at
+HEDGE_BUDGET_PERCENT of stage requests.
+"""
+
+import os
+import math
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Deque, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Stages whose requests are safe to send twice
+HEDGEABLE_STAGES = {'analyze', 'design'}
+
+
+class HedgePolicy:
+    """Tracks per-stage latency and decides when (and whether) to hedge"""
+
+    def __init__(self, stages: str = None, percentile: float = None, budget_percent: float = None,
+                 window: int = None, min_samples: int = None, min_delay: float = None):
+        stages = stages if stages is not None else os.getenv('HEDGE_STAGES', '')
+        requested = {s.strip() for s in stages.split(',') if s.strip()}
+        if requested - HEDGEABLE_STAGES:
+            logger.warning(f"⚠️ Not hedging non-idempotent stages: {', '.join(sorted(requested - HEDGEABLE_STAGES))}")
+        self.stages = requested & HEDGEABLE_STAGES
+        self.percentile = percentile or float(os.getenv('HEDGE_PERCENTILE', '95'))
+        self.budget_ratio = (budget_percent or float(os.getenv('HEDGE_BUDGET_PERCENT', '5'))) / 100
+        self.min_samples = min_samples or int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv('HEDGE_MIN_DELAY', '1'))
+        window = window or int(os.getenv('HEDGE_WINDOW', '200'))
+
+        self.latencies: Dict[str, Deque[float]] = {}
+        self._window = window
+        # Every request earns `budget_ratio` tokens and a hedge costs one
+        self.tokens = 1.0
+        self.max_tokens = 10.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, stage: str, latency: float):
+        """Record the observed latency of a successful stage request (hedged or not)"""
+        self.latencies.setdefault(stage, deque(maxlen=self._window)).append(latency)
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if this stage should not be hedged"""
+        samples = self.latencies.get(stage)
+        if stage not in self.stages or not samples or len(samples) < self.min_samples:
+            return None
+
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, math.ceil(len(ordered) * self.percentile / 100) - 1)
+        return max(self.min_delay, ordered[index])
+
+    def on_request(self):
+        self.requests += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.budget_ratio)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget; False if hedging would exceed it"""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.hedges += 1
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stages': sorted(self.stages),
+            'percentile': self.percentile,
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_rate': round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            'delays': {stage: self.hedge_delay(stage) for stage in self.stages}
+        }
+
+
+async def hedged_request(policy: HedgePolicy, stage: str, send: Callable[[], Awaitable[httpx.Response]],
+                         delay: float) -> Tuple[httpx.Response, bool]:
+    """
+    Run `send`, hedging with a second call after `delay` seconds if the budget allows.
+    Returns the response and whether it came from the backup.
+    """
+    primary = asyncio.create_task(send())
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not policy.try_spend():
+            return await primary, False
+
+        logger.info(f"🔀 Hedging {stage} request after {delay:.1f}s")
+        backup = asyncio.create_task(send())
+        tasks.append(backup)
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        policy.hedge_wins += 1
+                    return task.result(), task is backup
+
+        # Both attempts failed: surface the primary's error
+        return primary.result(), False
+    finally:
+        # Cancel the loser (or both, if the job itself was cancelled)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Bulk domain ingestion: streams a CSV or NDJSON file of domains into the job queue.
+
+Domains are normalized and deduplicated, then enqueued in multi-row batches with
+one enqueue_site_generation_batch RPC per batch (see supabase/bulk-ingest-schema.sql),
+which also skips domains that already have a job. Progress is checkpointed after
+every batch so an interrupted run resumes where it stopped.
+
+Bulk jobs are queued below interactive submissions (priority 0) by default and
+get their own, longer deadline, since a large batch may wait hours to be claimed.
+
+Usage:
+    python ingest.py portfolio.csv --priority 5 --deadline-seconds 86400
+    python ingest.py domains.ndjson --batch-size 1000 --no-resume
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DOMAIN_PATTERN = re.compile(r'^(?=.{1,253}$)(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$')
+
+
+def normalize_domain(value: str) -> Optional[str]:
+    """Lowercase, strip scheme/path/port/www and validate; None if not a domain"""
+    domain = (value or '').strip().lower()
+    domain = re.sub(r'^[a-z][a-z0-9+.-]*://', '', domain)
+    domain = domain.split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+    domain = domain.rsplit('@', 1)[-1].split(':', 1)[0].rstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+    return domain if DOMAIN_PATTERN.match(domain) else None
+
+
+def read_domains(path: str, file_format: str, column: str) -> Iterator[str]:
+    """Yield raw domain values one row at a time without loading the file"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'ndjson':
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield ''
+                    continue
+                yield record if isinstance(record, str) else str(record.get(column) or '')
+        else:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            normalized = [h.strip().lower() for h in header]
+            if column in normalized:
+                index = normalized.index(column)
+            else:
+                # Headerless file: the first row is data, domains in the first column
+                index = 0
+                yield header[0] if header else ''
+            for row in reader:
+                yield row[index] if len(row) > index else ''
+
+
+class IngestState:
+    """Resumable progress for one input file, checkpointed as JSON"""
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        stat = os.stat(input_path)
+        self.fingerprint = {'input': os.path.abspath(input_path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+        self.counters = {'rows_processed': 0, 'inserted': 0, 'skipped_existing': 0, 'duplicates': 0, 'invalid': 0}
+
+    def load(self) -> bool:
+        """Restore counters from a checkpoint of the same file; False if none applies"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        if saved.get('fingerprint') != self.fingerprint:
+            logger.warning(f"⚠️ Checkpoint {self.path} belongs to a different version of the file, starting over")
+            return False
+        self.counters.update(saved.get('counters', {}))
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'counters': self.counters,
+                       'updated_at': datetime.now().isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+
+def create_supabase():
+    """Supabase client with the same HTTP fallback as the worker"""
+    supabase_url = os.getenv('SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing required environment variables: SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+
+    try:
+        from supabase import create_client
+        return create_client(supabase_url, supabase_key)
+    except Exception as e:
+        logger.warning(f"⚠️ Standard Supabase client failed: {e}, falling back to HTTP-based client")
+        from supabase_http import create_http_client
+        return create_http_client(supabase_url, supabase_key)
+
+
+def enqueue_batch(supabase, domains: List[str], priority: int, job_template: Dict[str, Any], user_id: Optional[str]) -> Dict[str, int]:
+    """Insert one batch through a single RPC; returns inserted/skipped counts"""
+    timestamp = datetime.now().isoformat()
+    jobs = [{
+        'domain': domain,
+        'user_id': user_id,
+        'job_data': {**job_template, 'domain': domain, 'domains': [domain], 'timestamp': timestamp}
+    } for domain in domains]
+
+    result = supabase.rpc('enqueue_site_generation_batch', {'p_jobs': jobs, 'p_priority': priority})
+    # The HTTP fallback client executes RPCs immediately
+    if hasattr(result, 'execute'):
+        result = result.execute()
+    row = result.data[0] if result.data else {}
+    return {'inserted': int(row.get('inserted', 0)), 'skipped': int(row.get('skipped', 0))}
+
+
+def ingest(args, supabase=None) -> Dict[str, int]:
+    file_format = args.format
+    if file_format == 'auto':
+        file_format = 'ndjson' if args.input.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    state = IngestState(args.state_file or f"{args.input}.ingest-state.json", args.input)
+    if args.resume and state.load():
+        logger.info(f"⏯️ Resuming after {state.counters['rows_processed']} rows "
+                    f"({state.counters['inserted']} already inserted)")
+
+    supabase = supabase or create_supabase()
+    job_template = {
+        'regenerate': False,
+        'requestOrigin': args.origin,
+        'source': 'bulk_ingest',
+        'sourceFile': os.path.basename(args.input)
+    }
+    # Counted from enqueue time, so it must cover the wait behind the rest of the batch
+    if args.deadline_seconds > 0:
+        job_template['deadlineSeconds'] = args.deadline_seconds
+
+    counters = state.counters
+    skip_rows = counters['rows_processed']
+    seen = set()
+    batch: List[str] = []
+    rows_in_batch = 0
+    started = time.monotonic()
+    run_rows = 0
+
+    def flush():
+        nonlocal batch, rows_in_batch
+        if batch:
+            result = enqueue_batch(supabase, batch, args.priority, job_template, args.user_id)
+            counters['inserted'] += result['inserted']
+            counters['skipped_existing'] += result['skipped']
+        counters['rows_processed'] += rows_in_batch
+        state.save()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        logger.info(f"📥 {counters['rows_processed']} rows | {counters['inserted']} inserted, "
+                    f"{counters['skipped_existing']} existing, {counters['duplicates']} duplicates, "
+                    f"{counters['invalid']} invalid | {run_rows / elapsed:.0f} rows/s")
+        batch = []
+        rows_in_batch = 0
+
+    for row_number, raw in enumerate(read_domains(args.input, file_format, args.column)):
+        if row_number < skip_rows:
+            continue
+
+        rows_in_batch += 1
+        run_rows += 1
+        domain = normalize_domain(raw)
+        if not domain:
+            counters['invalid'] += 1
+        elif domain in seen:
+            counters['duplicates'] += 1
+        else:
+            seen.add(domain)
+            batch.append(domain)
+
+        if len(batch) >= args.batch_size:
+            flush()
+
+    flush()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"✅ Ingestion finished in {elapsed:.1f}s: {counters['inserted']} jobs enqueued "
+                f"({run_rows / max(elapsed, 1e-6):.0f} rows/s this run)")
+    return counters
+
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Stream a CSV or NDJSON file of domains into the site generation queue')
+    parser.add_argument('input', help='CSV (domain column or first column) or NDJSON file')
+    parser.add_argument('--format', choices=['auto', 'csv', 'ndjson'], default='auto')
+    parser.add_argument('--column', default='domain', help='CSV column / NDJSON key holding the domain')
+    parser.add_argument('--priority', type=int, default=int(os.getenv('INGEST_PRIORITY', '-10')),
+                        help='Queue priority, higher runs first (interactive submissions use 0)')
+    parser.add_argument('--deadline-seconds', type=float, default=float(os.getenv('INGEST_DEADLINE_SECONDS', '604800')),
+                        help='Per-job deadline from enqueue time (0 = the worker\'s plan/default deadline)')
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('INGEST_BATCH_SIZE', '500')))
+    parser.add_argument('--user-id', default=None, help='Owner of the generated jobs')
+    parser.add_argument('--origin', default=os.getenv('REQUEST_ORIGIN', 'https://domaintobiz.vercel.app'),
+                        help='Agent API origin the worker should call for these jobs')
+    parser.add_argument('--state-file', default=None, help='Checkpoint path (default: <input>.ingest-state.json)')
+    parser.add_argument('--no-resume', dest='resume', action='store_false', help='Ignore any existing checkpoint')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    try:
+        ingest(args)
+    except KeyboardInterrupt:
+        logger.info("👋 Interrupted; rerun the same command to resume from the last checkpoint")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"❌ Ingestion failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+In-flight job bookkeeping shared by the worker, admission control and diagnostics
+"""
+
+import time
+import asyncio
+import contextvars
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+
+@dataclass
+class InFlightJob:
+    """State of a job currently being processed by this worker"""
+    job_id: str
+    domain: str
+    stage: str = 'claimed'
+    started_at: float = field(default_factory=time.monotonic)
+    payload_bytes: int = 0
+    peak_payload_bytes: int = 0
+    stage_bytes: Dict[str, int] = field(default_factory=dict)
+    cancelled: bool = False
+    deadline: Optional[Any] = None
+    task: Optional[asyncio.Task] = None
+
+    def record_payload(self, stage: str, size: int):
+        """Account for a stage response held in memory"""
+        self.stage_bytes[stage] = self.stage_bytes.get(stage, 0) + size
+        self.payload_bytes += size
+        self.peak_payload_bytes = max(self.peak_payload_bytes, self.payload_bytes)
+
+    def release_payload(self, stage: str):
+        """Mark one stage's payload as no longer held in memory"""
+        self.payload_bytes -= self.stage_bytes.pop(stage, 0)
+
+    def release_payloads(self):
+        """Mark stage payloads as no longer held in memory"""
+        self.payload_bytes = 0
+        self.stage_bytes.clear()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'domain': self.domain,
+            'stage': self.stage,
+            'elapsed_seconds': round(self.elapsed, 1),
+            'payload_bytes': self.payload_bytes,
+            'peak_payload_bytes': self.peak_payload_bytes,
+            'deadline': self.deadline.to_dict() if self.deadline else None
+        }
+
+
+# The job being processed by the current asyncio task (set once per job task)
+current_job: contextvars.ContextVar[Optional[InFlightJob]] = contextvars.ContextVar('current_job', default=None)
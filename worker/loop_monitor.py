@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Event loop lag monitor that detects blocking calls on the worker's event loop
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds (last bucket catches everything above)
+LAG_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LagHistogram:
+    """Fixed-bucket histogram of event loop scheduling delays"""
+
+    def __init__(self, buckets_ms: List[float] = None):
+        self.buckets_ms = list(buckets_ms or LAG_BUCKETS_MS)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, lag_ms: float):
+        """Record a single lag sample"""
+        for i, bound in enumerate(self.buckets_ms):
+            if lag_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.total += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def percentile(self, pct: float) -> float:
+        """Approximate percentile (upper bound of the bucket containing it)"""
+        if not self.total:
+            return 0.0
+
+        target = self.total * pct / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(float(self.buckets_ms[i]), self.max_ms) if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return histogram state as a plain dict"""
+        labels = [f"le_{bound}ms" for bound in self.buckets_ms] + ['inf']
+        return {
+            'count': self.total,
+            'avg_ms': round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping coroutine.
+
+    A coroutine sleeps for a fixed interval and records the difference between
+    the expected and actual wake-up time. Because a blocked loop cannot report on
+    itself, a watchdog thread watches the coroutine's heartbeat and dumps the
+    loop thread's stack while the blocking call is still on it.
+    """
+
+    def __init__(self, interval: float = None, threshold_ms: float = None, report_interval: float = None):
+        self.interval = interval if interval is not None else float(os.getenv('LOOP_LAG_INTERVAL', '0.1'))
+        self.threshold_ms = threshold_ms if threshold_ms is not None else float(os.getenv('LOOP_LAG_THRESHOLD_MS', '250'))
+        self.report_interval = report_interval if report_interval is not None else float(os.getenv('LOOP_LAG_REPORT_INTERVAL', '300'))
+        self.histogram = LagHistogram()
+        self.stalls = 0
+        self.last_stall: Optional[Dict[str, Any]] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._stall_reported = False
+
+    def start(self):
+        """Start the sampling coroutine and the watchdog thread on the running loop"""
+        if self._task and not self._task.done():
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+
+        logger.info(f"⏱️ Loop lag monitor started (interval: {self.interval}s, threshold: {self.threshold_ms}ms)")
+
+    async def stop(self):
+        """Stop sampling and the watchdog"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            lag_ms = max(0.0, (now - expected) * 1000)
+
+            self._heartbeat = time.monotonic()
+            self._stall_reported = False
+            self.histogram.observe(lag_ms)
+
+            if lag_ms > self.threshold_ms:
+                self.stalls += 1
+                logger.warning(f"🐢 Event loop lagged {lag_ms:.0f}ms (threshold: {self.threshold_ms:.0f}ms)")
+
+            if self.report_interval and now - last_report >= self.report_interval:
+                last_report = now
+                stats = self.histogram.snapshot()
+                logger.info(f"⏱️ Loop lag: p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms "
+                            f"max={stats['max_ms']}ms stalls={self.stalls}")
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack while it is blocked"""
+        poll = max(self.threshold_ms / 1000 / 2, 0.01)
+
+        while not self._stop.wait(poll):
+            blocked_ms = (time.monotonic() - self._heartbeat) * 1000 - self.interval * 1000
+            if blocked_ms <= self.threshold_ms or self._stall_reported:
+                continue
+
+            self._stall_reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else '<no frame>'
+            self.last_stall = {
+                'blocked_ms': round(blocked_ms, 1),
+                'detected_at': time.time(),
+                'stack': stack
+            }
+            logger.warning(f"🚧 Event loop blocked for {blocked_ms:.0f}ms, offending stack:\n{stack}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return lag histogram and stall information"""
+        return {
+            'threshold_ms': self.threshold_ms,
+            'stalls': self.stalls,
+            'histogram': self.histogram.snapshot(),
+            'last_stall': self.last_stall
+        }
@@ -1,5 +1,7 @@
 import os
 import json
+import socket
+import time
 import asyncio
 import logging
 from typing import Dict, Any, Optional
@@ -8,6 +10,14 @@ import httpx
 from supabase import create_client, Client
 from openai import OpenAI
 from dotenv import load_dotenv
+from admission import AdmissionController
+from jobs import InFlightJob, current_job
+from rate_limit import StageRateLimiter
+from hedging import HedgePolicy, hedged_request
+from site_optimizer import optimize_site, to_website_file_rows
+from deadlines import JobDeadline, DeadlineExceeded, STAGE_ORDER
+from recording import StageRecorder
+from maintenance import MaintenanceRunner
 
 # Load environment variables
 load_dotenv()
@@ -17,7 +27,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class SiteGenerationWorker:
-    def __init__(self):
+    def __init__(self, supabase=None):
         # Debug environment variables
         supabase_url = os.getenv('SUPABASE_URL')
         supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
@@ -28,84 +38,90 @@ class SiteGenerationWorker:
         logger.info(f"  SUPABASE_SERVICE_ROLE_KEY: {'SET' if supabase_key else 'MISSING'} (length: {len(supabase_key) if supabase_key else 0})")
         logger.info(f"  OPENAI_API_KEY: {'SET' if openai_key else 'MISSING'} (length: {len(openai_key) if openai_key else 0})")
         
-        if not supabase_url or not supabase_key:
+        if supabase is not None:
+            # Injected client (e.g. the in-memory store used by replay.py)
+            self.supabase = supabase
+        elif not supabase_url or not supabase_key:
             raise ValueError("Missing required environment variables: SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
-        
-        try:
-            logger.info("🔌 Creating Supabase client...")
-            self.supabase: Client = create_client(supabase_url, supabase_key)
-            logger.info("✅ Supabase client created successfully")
-        except Exception as e:
-            logger.warning(f"⚠️ Standard Supabase client failed: {e}")
-            logger.info("🔄 Falling back to HTTP-based client...")
+        else:
             try:
-                from supabase_http import create_http_client
-                self.supabase = create_http_client(supabase_url, supabase_key)
-                logger.info("✅ HTTP-based Supabase client created successfully")
-            except Exception as e2:
-                logger.error(f"❌ HTTP client also failed: {e2}")
-                raise
+                logger.info("🔌 Creating Supabase client...")
+                self.supabase: Client = create_client(supabase_url, supabase_key)
+                logger.info("✅ Supabase client created successfully")
+            except Exception as e:
+                logger.warning(f"⚠️ Standard Supabase client failed: {e}")
+                logger.info("🔄 Falling back to HTTP-based client...")
+                try:
+                    from supabase_http import create_http_client
+                    self.supabase = create_http_client(supabase_url, supabase_key)
+                    logger.info("✅ HTTP-based Supabase client created successfully")
+                except Exception as e2:
+                    logger.error(f"❌ HTTP client also failed: {e2}")
+                    raise
         
         self.openai = OpenAI(api_key=openai_key)
         self.worker_id = f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.is_running = True
         
+        # Concurrent job slots, gated by concurrency and memory headroom
+        self.in_flight: Dict[str, InFlightJob] = {}
+        self.admission = AdmissionController()
+        self.metrics_log_interval = float(os.getenv('METRICS_LOG_INTERVAL', '60'))
+        self.rate_limiter = StageRateLimiter()
+        self.hedging = HedgePolicy()
+        self.optimize_assets = os.getenv('OPTIMIZE_ASSETS', 'true').lower() == 'true'
+        
+        # Agent API transport (replaced by replay.py) and optional traffic recording
+        self.http_transport: Optional[httpx.AsyncBaseTransport] = None
+        self.recorder = StageRecorder.from_env()
+        
+        # Runtime control state (see admin_api.py)
+        self.draining = False
+        self.drain_timeout = float(os.getenv('DRAIN_TIMEOUT', '280'))
+        self.last_poll_at = time.monotonic()
+        self.poll_stall_timeout = float(os.getenv('POLL_STALL_TIMEOUT', '120'))
+        self.shutdown_task: Optional[asyncio.Task] = None
+        self.cancel_poll_interval = float(os.getenv('CANCEL_POLL_INTERVAL', '5'))
+        
+        # Owners' plans (user_plans.plan_type) for plan-based deadlines, cached per user
+        self.plan_cache: Dict[str, Any] = {}
+        self.plan_cache_ttl = float(os.getenv('PLAN_CACHE_TTL', '300'))
+        
+        # Archiving of finished jobs, run by whichever worker holds the maintenance lease
+        self.maintenance = MaintenanceRunner(self.supabase, f"{socket.gethostname()}:{self.worker_id}")
+        
         logger.info(f"🤖 Site Generation Worker initialized: {self.worker_id}")
 
     async def poll_queue(self):
         """Main queue polling loop using table-based approach"""
-        logger.info("🔄 Starting table-based queue polling...")
+        logger.info(f"🔄 Starting table-based queue polling (concurrency: {self.admission.max_concurrency})...")
+        last_metrics_log = 0.0
+        cancel_watcher = asyncio.create_task(self.watch_cancellations(), name='cancel-watcher')
+        maintenance = asyncio.create_task(self.maintenance.run_forever(), name='queue-maintenance')
         
         while self.is_running:
+            self.last_poll_at = time.monotonic()
             try:
-                # Query for queued jobs from site_jobs table
-                result = self.supabase.table('site_jobs').select('*').eq('status', 'queued').order('created_at').limit(1).execute()
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time - last_metrics_log >= self.metrics_log_interval:
+                    last_metrics_log = loop_time
+                    logger.info(f"📊 Admission: {self.admission.snapshot(self.in_flight.values())}")
                 
-                if result.data and len(result.data) > 0:
-                    job = result.data[0]
-                    job_id = job['id']
-                    domain = job['domain']
-                    
-                    logger.info(f"📋 Processing job {job_id} for domain: {domain}")
-                    
-                    try:
-                        # Mark job as processing
-                        update_query = self.supabase.table('site_jobs').update({
-                            'status': 'processing',
-                            'worker_id': self.worker_id,
-                            'started_at': datetime.now().isoformat()
-                        }).eq('id', job_id)
-                        
-                        # Handle different client types
-                        if hasattr(update_query, 'execute_update'):
-                            update_query.execute_update()  # HTTP client
-                        else:
-                            update_query.execute()  # Standard client
-                        
-                        # Process the job
-                        await self.process_job({
-                            'site_job_id': job_id,
-                            'domain': domain,
-                            'user_id': job.get('user_id'),
-                            'job_data': job.get('job_data', {})
-                        })
-                        
-                        logger.info(f"✅ Job {job_id} completed successfully")
-                        
-                    except Exception as job_error:
-                        logger.error(f"❌ Job processing failed: {job_error}")
-                        # Update job status to failed
-                        update_query = self.supabase.table('site_jobs').update({
-                            'status': 'failed',
-                            'error_message': str(job_error),
-                            'completed_at': datetime.now().isoformat()
-                        }).eq('id', job_id)
-                        
-                        if hasattr(update_query, 'execute_update'):
-                            update_query.execute_update()
-                        else:
-                            update_query.execute()
-                    
+                if self.draining:
+                    await asyncio.sleep(1)
+                    continue
+                
+                # Only claim another job if we have a free slot and memory headroom
+                admit, reason = self.admission.can_admit(self.in_flight.values())
+                if not admit:
+                    logger.debug(f"⏸️ Not claiming new jobs: {reason}")
+                    await asyncio.sleep(1)
+                    continue
+                
+                job = await self.claim_next_job()
+                
+                if job:
+                    self.start_job(job)
                 else:
                     # No jobs available, wait before polling again
                     await asyncio.sleep(5)
@@ -113,6 +129,149 @@ class SiteGenerationWorker:
             except Exception as e:
                 logger.error(f"❌ Queue polling error: {e}")
                 await asyncio.sleep(10)
+        
+        cancel_watcher.cancel()
+        maintenance.cancel()
+
+    async def watch_cancellations(self):
+        """Cancel in-flight jobs whose rows were marked cancelled or deleted, one query per interval"""
+        while True:
+            await asyncio.sleep(self.cancel_poll_interval)
+            if not self.in_flight:
+                continue
+            
+            try:
+                job_ids = list(self.in_flight)
+                result = self.supabase.table('site_jobs').select('id,status').in_('id', job_ids).execute()
+                rows = {row['id']: row for row in result.data or []}
+                for job_id in job_ids:
+                    row = rows.get(job_id)
+                    if row is None:
+                        # Deleting a project (api/projects.js) removes its row outright
+                        self.cancel_job(job_id, 'job deleted')
+                    elif row.get('status') == 'cancelled':
+                        self.cancel_job(job_id, 'job marked cancelled')
+            except Exception as e:
+                logger.error(f"❌ Cancellation check failed: {e}")
+
+    def cancel_job(self, job_id: str, reason: str = 'cancel requested') -> bool:
+        """Cancel an in-flight job's task and free its slot; returns False if not running here"""
+        job = self.in_flight.get(job_id)
+        if not job or job.cancelled:
+            return False
+        
+        logger.info(f"🛑 Cancelling job {job_id} ({job.domain}) during {job.stage}: {reason}")
+        job.cancelled = True
+        if job.task:
+            # Aborts the outstanding agent request at its next await
+            job.task.cancel()
+        self.finish_job(job)
+        return True
+
+    async def claim_next_job(self) -> Optional[Dict[str, Any]]:
+        """Atomically claim the highest-priority queued job (dequeue_next_job locks it with SKIP LOCKED)"""
+        result = self.supabase.rpc('dequeue_next_job', {'p_worker_id': self.worker_id})
+        
+        # The HTTP client executes RPCs immediately
+        if hasattr(result, 'execute'):
+            result = result.execute()
+        
+        if not result.data:
+            return None
+        
+        row = result.data[0]
+        return {
+            'id': row['job_id'],
+            'domain': row['domain'],
+            'user_id': row.get('user_id'),
+            'job_data': row.get('job_data') or {},
+            'created_at': row.get('job_created_at'),
+            'priority': row.get('job_priority')
+        }
+
+    def start_job(self, job: Dict[str, Any]):
+        """Run a claimed job as a task that occupies one slot until it finishes"""
+        job_id = job['id']
+        in_flight = InFlightJob(job_id=job_id, domain=job['domain'])
+        self.in_flight[job_id] = in_flight
+        in_flight.task = asyncio.create_task(self.run_job(job, in_flight), name=f"job-{job_id}")
+        in_flight.task.add_done_callback(lambda _: self.finish_job(in_flight))
+        
+        logger.info(f"📋 Processing job {job_id} for domain: {job['domain']} "
+                    f"({len(self.in_flight)}/{self.admission.max_concurrency} slots in use)")
+
+    def finish_job(self, in_flight: InFlightJob):
+        """Free the job's slot and fold its memory usage into admission estimates"""
+        if self.in_flight.pop(in_flight.job_id, None):
+            self.admission.record_job_finished(in_flight)
+        if self.recorder:
+            self.recorder.finish_job(in_flight.job_id)
+
+    async def run_job(self, job: Dict[str, Any], in_flight: InFlightJob):
+        """Process a claimed job and record failures on the job row"""
+        job_id = job['id']
+        current_job.set(in_flight)
+        if self.recorder:
+            self.recorder.record_job(job)
+        
+        try:
+            # Resolved here so that bad job data fails the job instead of stranding the claimed row
+            owner = job.get('user_id') or (job.get('job_data') or {}).get('userId')
+            in_flight.deadline = JobDeadline.for_job(job, plan=self.get_user_plan(owner))
+            # Reject jobs that already waited too long to finish in time
+            in_flight.deadline.ensure_feasible(STAGE_ORDER[0])
+            
+            await self.process_job({
+                'site_job_id': job_id,
+                'domain': job['domain'],
+                'user_id': job.get('user_id'),
+                'job_data': job.get('job_data', {})
+            })
+            
+            logger.info(f"✅ Job {job_id} completed successfully")
+            
+        except asyncio.CancelledError:
+            if not in_flight.cancelled:
+                raise
+            logger.info(f"🛑 Job {job_id} stopped after cancellation")
+        except Exception as job_error:
+            logger.error(f"❌ Job processing failed: {job_error}")
+            try:
+                # Update job status to failed
+                update_query = self.supabase.table('site_jobs').update({
+                    'status': 'failed',
+                    'error_message': str(job_error),
+                    'completed_at': datetime.now().isoformat()
+                }).eq('id', job_id).eq('status', 'processing')
+                
+                if hasattr(update_query, 'execute_update'):
+                    update_query.execute_update()
+                else:
+                    update_query.execute()
+            except Exception as e:
+                logger.error(f"❌ Failed to mark job {job_id} as failed: {e}")
+
+    def get_user_plan(self, user_id: Optional[str]) -> Optional[str]:
+        """The user's plan_type from user_plans; None for anonymous jobs or unknown users"""
+        if not user_id:
+            return None
+        
+        now = time.monotonic()
+        cached = self.plan_cache.get(user_id)
+        if cached and now - cached[1] < self.plan_cache_ttl:
+            return cached[0]
+        
+        try:
+            result = self.supabase.table('user_plans').select('plan_type').eq('user_id', user_id).limit(1).execute()
+            plan = result.data[0].get('plan_type') if result.data else None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not look up plan for user {user_id}: {e}")
+            return None
+        
+        if len(self.plan_cache) >= 10000:
+            self.plan_cache.clear()
+        self.plan_cache[user_id] = (plan, now)
+        return plan
 
     async def process_job(self, payload: Dict[str, Any]):
         """Process a single site generation job"""
@@ -126,65 +285,101 @@ class SiteGenerationWorker:
             # Job is already marked as processing by dequeue_next_job
             await self.update_progress(site_job_id, 'initialize', 'running', 0, 'Starting site generation...')
             
+            # Stage outputs are merged into result_data as soon as they exist, so each one
+            # can be dropped once no later stage needs it; failed merges are retried at the end
+            unsaved: Dict[str, Any] = {}
+            job = current_job.get()
+            
             # Step 1: Domain Analysis
             await self.update_progress(site_job_id, 'analyze', 'running', 10, 'Analyzing domain...')
             domain_analysis = await self.analyze_domain(domain, job_data)
+            await self.save_results(site_job_id, {'domain': domain, 'domain_analysis': domain_analysis}, unsaved)
             await self.update_progress(site_job_id, 'analyze', 'completed', 20, 'Domain analysis completed')
             
             # Step 2: Strategy Generation
             await self.update_progress(site_job_id, 'strategy', 'running', 30, 'Generating business strategy...')
             strategy = await self.generate_strategy(domain, domain_analysis, job_data)
+            # Only the strategy stage reads the analysis
+            del domain_analysis
+            if job:
+                job.release_payload('analyze')
+            await self.save_results(site_job_id, {'strategy': strategy}, unsaved)
             await self.update_progress(site_job_id, 'strategy', 'completed', 40, 'Business strategy generated')
             
             # Step 3: Design System
             await self.update_progress(site_job_id, 'design', 'running', 50, 'Creating design system...')
             design_system = await self.generate_design(domain, strategy, job_data)
+            await self.save_results(site_job_id, {'design_system': design_system}, unsaved)
             await self.update_progress(site_job_id, 'design', 'completed', 60, 'Design system created')
             
             # Step 4: Content Generation
             await self.update_progress(site_job_id, 'content', 'running', 70, 'Generating website content...')
             content = await self.generate_content(domain, strategy, design_system, job_data)
+            await self.save_results(site_job_id, {'content': content}, unsaved)
             await self.update_progress(site_job_id, 'content', 'completed', 80, 'Content generated')
             
             # Step 5: Website Building
             await self.update_progress(site_job_id, 'build', 'running', 85, 'Building website...')
             website = await self.build_website(domain, strategy, design_system, content, job_data)
+            await self.save_results(site_job_id, {'website': website}, unsaved)
             await self.update_progress(site_job_id, 'build', 'completed', 90, 'Website built')
             
+            # Step 5b: Static asset optimization (minify, hash, precompress)
+            await self.update_progress(site_job_id, 'optimize', 'running', 92, 'Optimizing website assets...')
+            artifacts = await self.optimize_website(website)
+            await self.update_progress(site_job_id, 'optimize', 'completed', 93, 'Website assets optimized' if artifacts else 'Asset optimization skipped')
+            
             # Step 6: Deployment
             await self.update_progress(site_job_id, 'deploy', 'running', 95, 'Deploying website...')
             deployment = await self.deploy_website(website, domain, job_data)
-            await self.update_progress(site_job_id, 'deploy', 'completed', 100, 'Website deployed successfully')
+            del website
+            if job:
+                job.release_payload('build')
             
-            # Save final results
-            result_data = {
-                'domain': domain,
-                'domain_analysis': domain_analysis,
-                'strategy': strategy,
-                'design_system': design_system,
-                'content': content,
-                'website': website,
+            # Save final results, including any stage output that failed to merge earlier
+            await self.save_results(site_job_id, {
+                **unsaved,
                 'deployment': deployment,
+                'artifacts': artifacts,
                 'completed_at': datetime.now().isoformat()
-            }
+            })
             
-            # Update job as completed
+            # Update job as completed. This must happen before the 100% progress row:
+            # update_job_progress marks the job completed itself, which this guard would
+            # then mistake for a cancellation
             update_query = self.supabase.table('site_jobs').update({
                 'status': 'completed',
-                'result_data': result_data,
                 'completed_at': datetime.now().isoformat()
-            }).eq('id', site_job_id)
+            }).eq('id', site_job_id).eq('status', 'processing')
             
             if hasattr(update_query, 'execute_update'):
-                update_query.execute_update()
+                updated = update_query.execute_update()
             else:
-                update_query.execute()
+                updated = update_query.execute()
+            
+            # No row left in 'processing' means the job was cancelled meanwhile
+            if not updated.data:
+                logger.info(f"🛑 Job {site_job_id} was cancelled before completion, skipping site record")
+                return
+            await self.update_progress(site_job_id, 'deploy', 'completed', 100, 'Website deployed successfully')
             
             # Create site record
-            await self.create_site_record(site_job_id, domain, result_data, job_data)
+            await self.create_site_record(site_job_id, domain, {
+                'strategy': strategy,
+                'content': content,
+                'design_system': design_system,
+                'deployment': deployment
+            }, job_data)
+            
+            if job:
+                job.release_payloads()
             
             logger.info(f"✅ Job completed successfully for {domain}")
             
+        except asyncio.CancelledError:
+            # Cancelled jobs skip all remaining progress and result writes
+            logger.info(f"🛑 Job cancelled for {domain} (Job ID: {site_job_id})")
+            raise
         except Exception as e:
             logger.error(f"❌ Job failed for {domain}: {e}")
             # Update job as failed
@@ -192,7 +387,7 @@ class SiteGenerationWorker:
                 'status': 'failed',
                 'error_message': str(e),
                 'completed_at': datetime.now().isoformat()
-            }).eq('id', site_job_id)
+            }).eq('id', site_job_id).eq('status', 'processing')
             
             if hasattr(update_query, 'execute_update'):
                 update_query.execute_update()
@@ -200,6 +395,58 @@ class SiteGenerationWorker:
                 update_query.execute()
             await self.update_progress(site_job_id, 'error', 'failed', 0, f'Job failed: {str(e)}')
 
+    async def save_results(self, job_id: str, results: Dict[str, Any], unsaved: Optional[Dict[str, Any]] = None):
+        """Merge results into the job's result_data; on failure keep them in `unsaved` for a later retry"""
+        try:
+            result = self.supabase.rpc('merge_job_result', {'p_job_id': job_id, 'p_result': results})
+            if hasattr(result, 'execute'):
+                result.execute()
+        except Exception as e:
+            logger.error(f"❌ Failed to save {', '.join(results)} for job {job_id}: {e}")
+            if unsaved is not None:
+                unsaved.update(results)
+
+    async def post_stage(self, stage: str, url: str, body: Dict[str, Any], timeout: float) -> httpx.Response:
+        """POST a stage request to the agent API and account for the response payload"""
+        await self.rate_limiter.acquire(stage)
+        
+        job = current_job.get()
+        if job and job.deadline:
+            timeout = job.deadline.stage_timeout(stage, timeout)
+        
+        async def send() -> httpx.Response:
+            async with httpx.AsyncClient(transport=self.http_transport) as client:
+                return await client.post(url, json=body, timeout=timeout)
+        
+        # Idempotent stages may be hedged when the primary request is slow. httpx's timeout
+        # applies per operation, so the whole call (including any hedge) is bounded here
+        self.hedging.on_request()
+        started = time.monotonic()
+        hedge_delay = self.hedging.hedge_delay(stage)
+        try:
+            async with asyncio.timeout(timeout):
+                if hedge_delay is not None and hedge_delay < timeout:
+                    response, _ = await hedged_request(self.hedging, stage, send, hedge_delay)
+                else:
+                    response = await send()
+        except TimeoutError:
+            raise httpx.TimeoutException(f"{stage} request exceeded its {timeout:.1f}s budget")
+        
+        latency = time.monotonic() - started
+        if response.status_code == 200:
+            # A backup win is recorded at the elapsed time, which is already past the hedge
+            # delay, so it cannot pull the percentile down (recording the stage timeout
+            # instead would push it up until hedging switched itself off)
+            self.hedging.record(stage, latency)
+        
+        if self.recorder:
+            self.recorder.record_stage(job.job_id if job else None, stage, response, latency)
+        
+        if job:
+            job.record_payload(stage, len(response.content))
+        
+        return response
+
     async def analyze_domain(self, domain: str, job_data: Dict) -> Dict[str, Any]:
         """Analyze domain using AI"""
         logger.info(f"🔍 Analyzing domain: {domain}")
@@ -212,18 +459,19 @@ class SiteGenerationWorker:
         # Call domain analysis API
         try:
             request_origin = job_data.get('requestOrigin', 'https://domaintobiz.vercel.app')
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{request_origin}/api/analyze", json={
-                    'domains': [domain]
-                }, timeout=120)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        return data['data']['bestDomain']
-                
-                raise Exception(f"Domain analysis API failed: {response.status_code}")
-                
+            response = await self.post_stage('analyze', f"{request_origin}/api/analyze", {
+                'domains': [domain]
+            }, timeout=120)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('success'):
+                    return data['data']['bestDomain']
+            
+            raise Exception(f"Domain analysis API failed: {response.status_code}")
+            
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Domain analysis failed: {e}")
             # Return fallback analysis
@@ -246,22 +494,21 @@ class SiteGenerationWorker:
         
         try:
             request_origin = job_data.get('requestOrigin', 'https://domaintobiz.vercel.app')
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{request_origin}/api/strategy", json={
-                    'domainAnalysis': domain_analysis,
-                    'analysisId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    'regenerate': job_data.get('regenerate', False),
-                    'userComments': job_data.get('comments'),
-                    'projectId': job_data.get('projectId')
-                }, timeout=120)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        return data['data']
-                
-                raise Exception(f"Strategy generation failed: {response.status_code}")
-                
+            response = await self.post_stage('strategy', f"{request_origin}/api/strategy", {
+                'domainAnalysis': domain_analysis,
+                'analysisId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                'regenerate': job_data.get('regenerate', False),
+                'userComments': job_data.get('comments'),
+                'projectId': job_data.get('projectId')
+            }, timeout=120)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('success'):
+                    return data['data']
+            
+            raise Exception(f"Strategy generation failed: {response.status_code}")
+            
         except Exception as e:
             logger.error(f"❌ Strategy generation failed: {e}")
             raise
@@ -272,35 +519,36 @@ class SiteGenerationWorker:
         
         try:
             request_origin = job_data.get('requestOrigin', 'https://domaintobiz.vercel.app')
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{request_origin}/api/agents/design", json={
-                    'domain': domain,
-                    'strategy': strategy,
-                    'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                }, timeout=120)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        return data['data']
-                
-                # Return fallback design
-                return {
-                    'colorPalette': {
-                        'primary': '#3B82F6',
-                        'secondary': '#1E40AF',
-                        'accent': '#60A5FA',
-                        'background': '#FFFFFF',
-                        'text': '#1F2937'
-                    },
-                    'typography': {
-                        'primary': 'Inter',
-                        'secondary': 'system-ui'
-                    },
-                    'layout': 'modern-minimal',
-                    'fallback': True
-                }
-                
+            response = await self.post_stage('design', f"{request_origin}/api/agents/design", {
+                'domain': domain,
+                'strategy': strategy,
+                'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            }, timeout=120)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('success'):
+                    return data['data']
+            
+            # Return fallback design
+            return {
+                'colorPalette': {
+                    'primary': '#3B82F6',
+                    'secondary': '#1E40AF',
+                    'accent': '#60A5FA',
+                    'background': '#FFFFFF',
+                    'text': '#1F2937'
+                },
+                'typography': {
+                    'primary': 'Inter',
+                    'secondary': 'system-ui'
+                },
+                'layout': 'modern-minimal',
+                'fallback': True
+            }
+            
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Design generation failed: {e}")
             # Return fallback design
@@ -326,24 +574,23 @@ class SiteGenerationWorker:
         
         try:
             request_origin = job_data.get('requestOrigin', 'https://domaintobiz.vercel.app')
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{request_origin}/api/agents/content", json={
-                    'domain': domain,
-                    'strategy': strategy,
-                    'designSystem': design_system,
-                    'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    'regenerate': job_data.get('regenerate', False),
-                    'userComments': job_data.get('comments'),
-                    'projectId': job_data.get('projectId')
-                }, timeout=120)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        return data['data']
-                
-                raise Exception(f"Content generation failed: {response.status_code}")
-                
+            response = await self.post_stage('content', f"{request_origin}/api/agents/content", {
+                'domain': domain,
+                'strategy': strategy,
+                'designSystem': design_system,
+                'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                'regenerate': job_data.get('regenerate', False),
+                'userComments': job_data.get('comments'),
+                'projectId': job_data.get('projectId')
+            }, timeout=120)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('success'):
+                    return data['data']
+            
+            raise Exception(f"Content generation failed: {response.status_code}")
+            
         except Exception as e:
             logger.error(f"❌ Content generation failed: {e}")
             raise
@@ -354,29 +601,61 @@ class SiteGenerationWorker:
         
         try:
             request_origin = job_data.get('requestOrigin', 'https://domaintobiz.vercel.app')
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{request_origin}/api/generate-website", json={
-                    'domain': domain,
-                    'strategy': strategy,
-                    'designSystem': design_system,
-                    'websiteContent': content,
-                    'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    'regenerate': job_data.get('regenerate', False),
-                    'userComments': job_data.get('comments'),
-                    'projectId': job_data.get('projectId')
-                }, timeout=300)  # Longer timeout for website generation
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        return data['data']
-                
-                raise Exception(f"Website building failed: {response.status_code}")
-                
+            response = await self.post_stage('build', f"{request_origin}/api/generate-website", {
+                'domain': domain,
+                'strategy': strategy,
+                'designSystem': design_system,
+                'websiteContent': content,
+                'executionId': f"worker_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                'regenerate': job_data.get('regenerate', False),
+                'userComments': job_data.get('comments'),
+                'projectId': job_data.get('projectId')
+            }, timeout=300)  # Longer timeout for website generation
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('success'):
+                    return data['data']
+            
+            raise Exception(f"Website building failed: {response.status_code}")
+            
         except Exception as e:
             logger.error(f"❌ Website building failed: {e}")
             raise
 
+    async def optimize_website(self, website: Dict) -> Optional[Dict[str, Any]]:
+        """Store minified, content-hashed and precompressed variants of the built site in website_files"""
+        website_id = website.get('websiteId')
+        if not self.optimize_assets or not website_id:
+            return None
+        
+        logger.info(f"🗜️ Optimizing assets for website: {website_id}")
+        
+        try:
+            result = self.supabase.table('generated_websites').select('website_html,website_css,website_js').eq('id', website_id).limit(1).execute()
+            if not result.data or not result.data[0].get('website_html'):
+                logger.warning(f"⚠️ No HTML stored for website {website_id}, skipping optimization")
+                return None
+            
+            row = result.data[0]
+            if self.recorder:
+                job = current_job.get()
+                self.recorder.record_site(job.job_id if job else None, website_id, row)
+            # Minification and brotli are CPU-bound; keep them off the event loop
+            optimized = await asyncio.to_thread(optimize_site, row['website_html'], row.get('website_css'), row.get('website_js'))
+            
+            self.supabase.table('website_files').insert(to_website_file_rows(website_id, optimized['files'])).execute()
+            
+            manifest = optimized['manifest']
+            logger.info(f"🗜️ Optimized {len(manifest['files'])} file(s): "
+                        f"{manifest['original_bytes']} -> {manifest['minified_bytes']} bytes before compression")
+            return manifest
+            
+        except Exception as e:
+            # The site is already live unoptimized; don't fail the job over this
+            logger.error(f"❌ Asset optimization failed: {e}")
+            return None
+
     async def deploy_website(self, website: Dict, domain: str, job_data: Dict) -> Dict[str, Any]:
         """Deploy the generated website"""
         logger.info(f"🚀 Deploying website for: {domain}")
@@ -396,6 +675,12 @@ class SiteGenerationWorker:
 
     async def update_progress(self, job_id: str, step_name: str, status: str, progress: int, message: str):
         """Update job progress"""
+        job = current_job.get()
+        if job:
+            if job.cancelled:
+                return
+            job.stage = step_name
+        
         try:
             self.supabase.rpc('update_job_progress', {
                 'p_job_id': job_id,
@@ -434,10 +719,93 @@ class SiteGenerationWorker:
         except Exception as e:
             logger.error(f"❌ Failed to create site record: {e}")
 
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop claiming new jobs and wait for in-flight jobs; returns True if all finished"""
+        self.draining = True
+        timeout = self.drain_timeout if timeout is None else timeout
+        tasks = [job.task for job in self.in_flight.values() if job.task]
+        
+        logger.info(f"🚰 Draining: waiting up to {timeout:.0f}s for {len(tasks)} in-flight job(s)...")
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        
+        if self.in_flight:
+            logger.warning(f"⚠️ Drain timed out with {len(self.in_flight)} job(s) still running: {', '.join(self.in_flight)}")
+            return False
+        
+        logger.info("✅ Drain complete, no jobs in flight")
+        return True
+
+    def resume(self):
+        """Start claiming jobs again after a drain"""
+        if self.draining:
+            logger.info("▶️ Resuming job claims")
+        self.draining = False
+
+    def mark_job_cancelled(self, job_id: str, reason: str):
+        """Record a cancellation on the job row so it is not retried or completed"""
+        update_query = self.supabase.table('site_jobs').update({
+            'status': 'cancelled',
+            'error_message': reason,
+            'completed_at': datetime.now().isoformat()
+        }).eq('id', job_id).eq('status', 'processing')
+        
+        if hasattr(update_query, 'execute_update'):
+            update_query.execute_update()
+        else:
+            update_query.execute()
+
+    async def release_in_flight(self, reason: str = 'worker shut down before the job finished'):
+        """Stop jobs still running (e.g. after a drain timeout) and hand their rows back to the queue"""
+        jobs = list(self.in_flight.values())
+        if not jobs:
+            return
+        
+        logger.warning(f"⚠️ Releasing {len(jobs)} unfinished job(s) back to the queue: {', '.join(job.job_id for job in jobs)}")
+        tasks = [job.task for job in jobs if job.task]
+        for job in jobs:
+            self.cancel_job(job.job_id, reason)
+        # Let the tasks unwind first so they cannot write to the rows after they are released
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for job in jobs:
+            try:
+                result = self.supabase.rpc('release_job', {
+                    'p_job_id': job.job_id,
+                    'p_worker_id': self.worker_id,
+                    'p_reason': reason
+                })
+                if hasattr(result, 'execute'):
+                    result.execute()
+            except Exception as e:
+                logger.error(f"❌ Failed to release job {job.job_id}: {e}")
+
+    def set_concurrency(self, concurrency: int):
+        """Change the number of job slots; lowering it lets running jobs finish"""
+        logger.info(f"🎚️ Concurrency: {self.admission.max_concurrency} -> {concurrency}")
+        self.admission.max_concurrency = concurrency
+
+    def runtime_config(self) -> Dict[str, Any]:
+        """Settings that can be changed without a restart"""
+        return {
+            'concurrency': self.admission.max_concurrency,
+            'rate_limits': {stage: bucket.rate for stage, bucket in self.rate_limiter.buckets.items()},
+            'draining': self.draining
+        }
+
+    def request_shutdown(self):
+        """Start a graceful shutdown in the background (e.g. from a signal handler)"""
+        if not self.shutdown_task:
+            self.shutdown_task = asyncio.create_task(self.shutdown(), name='worker-shutdown')
+
     async def shutdown(self):
-        """Graceful shutdown"""
+        """Graceful shutdown: drain in-flight jobs, then stop the poll loop"""
         logger.info("🛑 Shutting down worker...")
+        if not await self.drain():
+            await self.release_in_flight()
         self.is_running = False
+        if self.recorder:
+            self.recorder.close()
 
 async def main():
     """Main entry point"""
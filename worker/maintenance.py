@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Periodic queue maintenance: archives finished jobs so site_jobs stays small.
+
+Every worker runs the loop, but a run only proceeds for the worker holding the
+'queue-maintenance' lease (acquire_worker_lease), so one worker does the work at
+a time and another takes over if it dies. Each run moves finished jobs older than
+ARCHIVE_AFTER_DAYS into site_jobs_archive in bounded batches, collapsing their
+progress rows into a summary (see supabase/job-maintenance-schema.sql).
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'queue-maintenance'
+
+
+class MaintenanceRunner:
+    """Leader-elected loop that archives finished jobs in batches"""
+
+    def __init__(self, supabase, holder: str):
+        self.supabase = supabase
+        self.holder = holder
+        self.enabled = os.getenv('MAINTENANCE_ENABLED', 'true').lower() == 'true'
+        self.interval = float(os.getenv('MAINTENANCE_INTERVAL', '3600'))
+        self.archive_after_days = int(os.getenv('ARCHIVE_AFTER_DAYS', '14'))
+        self.batch_size = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+        self.max_batches = int(os.getenv('ARCHIVE_MAX_BATCHES', '20'))
+        self.batch_pause = float(os.getenv('ARCHIVE_BATCH_PAUSE', '1'))
+        # Outlives the interval so the leader renews before anyone else can take over
+        self.lease_seconds = int(self.interval * 1.5)
+
+        self.is_leader = False
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.totals = {'runs': 0, 'jobs_archived': 0, 'progress_rows_collapsed': 0}
+
+    def _rpc(self, name: str, params: Dict[str, Any]):
+        result = self.supabase.rpc(name, params)
+        # The HTTP fallback client executes immediately
+        if hasattr(result, 'execute'):
+            result = result.execute()
+        data = result.data
+        return data[0] if isinstance(data, list) and data else data
+
+    def acquire_lease(self) -> bool:
+        acquired = bool(self._rpc('acquire_worker_lease', {
+            'p_name': LEASE_NAME,
+            'p_holder': self.holder,
+            'p_ttl_seconds': self.lease_seconds
+        }))
+        if acquired != self.is_leader:
+            logger.info(f"🧹 {'Became' if acquired else 'No longer'} maintenance leader ({self.holder})")
+        self.is_leader = acquired
+        return acquired
+
+    def release_lease(self):
+        if not self.is_leader:
+            return
+        try:
+            self._rpc('release_worker_lease', {'p_name': LEASE_NAME, 'p_holder': self.holder})
+            logger.info("🧹 Released maintenance lease")
+        except Exception as e:
+            logger.error(f"❌ Failed to release maintenance lease: {e}")
+        self.is_leader = False
+
+    async def run_once(self) -> Optional[Dict[str, Any]]:
+        """Archive up to max_batches batches if this worker is the leader; None otherwise"""
+        # Database calls block, and a large batch can take a while; keep them off the event loop
+        if not await asyncio.to_thread(self.acquire_lease):
+            logger.debug("🧹 Another worker holds the maintenance lease, skipping")
+            return None
+
+        started = time.monotonic()
+        run = {'jobs_archived': 0, 'progress_rows_collapsed': 0, 'batches': 0}
+
+        for batch in range(self.max_batches):
+            if batch:
+                await asyncio.sleep(self.batch_pause)
+                # Keep the lease while a long run is in progress
+                if not await asyncio.to_thread(self.acquire_lease):
+                    break
+
+            row = await asyncio.to_thread(self._rpc, 'archive_finished_jobs', {
+                'p_older_than_days': self.archive_after_days,
+                'p_batch_size': self.batch_size
+            }) or {}
+            archived = int(row.get('jobs_archived') or 0)
+            run['batches'] += 1
+            run['jobs_archived'] += archived
+            run['progress_rows_collapsed'] += int(row.get('progress_rows_collapsed') or 0)
+            if archived < self.batch_size:
+                break
+
+        run['seconds'] = round(time.monotonic() - started, 2)
+        run['finished_at'] = time.time()
+        self.last_run = run
+        self.totals['runs'] += 1
+        self.totals['jobs_archived'] += run['jobs_archived']
+        self.totals['progress_rows_collapsed'] += run['progress_rows_collapsed']
+
+        logger.info(f"🧹 Archived {run['jobs_archived']} jobs and {run['progress_rows_collapsed']} progress rows "
+                    f"older than {self.archive_after_days}d in {run['seconds']}s ({run['batches']} batches)")
+        return run
+
+    async def run_forever(self):
+        """Run maintenance every interval until cancelled"""
+        if not self.enabled:
+            return
+
+        # Stagger workers that start together so they don't all race for the lease
+        await asyncio.sleep(random.uniform(0, min(60.0, self.interval)))
+        try:
+            while True:
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"❌ Queue maintenance failed: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            self.release_lease()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'is_leader': self.is_leader,
+            'interval': self.interval,
+            'archive_after_days': self.archive_after_days,
+            'batch_size': self.batch_size,
+            'last_run': self.last_run,
+            'totals': self.totals
+        }
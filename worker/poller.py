@@ -8,36 +8,55 @@ import asyncio
 import signal
 import sys
 from main import SiteGenerationWorker
+from loop_monitor import LoopLagMonitor
+from profiler import WorkerProfiler
+from admin_api import AdminServer
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully"""
-    print(f"\n🛑 Received signal {signum}, shutting down...")
-    sys.exit(0)
+def handle_shutdown_signal(worker: SiteGenerationWorker, signum: int):
+    """Drain in-flight jobs on the first signal, exit immediately on the second"""
+    if worker.shutdown_task:
+        print(f"\n🛑 Received signal {signum} again, exiting without waiting for in-flight jobs")
+        worker.is_running = False
+        return
+    
+    print(f"\n🛑 Received signal {signum}, draining in-flight jobs before shutdown...")
+    worker.request_shutdown()
 
 async def run_worker():
     """Run the worker with error recovery"""
     worker = SiteGenerationWorker()
+    loop = asyncio.get_running_loop()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, handle_shutdown_signal, worker, sig)
+    
+    # Detect blocking calls on the event loop and allow on-demand profiling
+    loop_monitor = LoopLagMonitor()
+    loop_monitor.start()
+    profiler = WorkerProfiler()
+    profiler.install_signal_handlers(loop)
     
-    while True:
+    admin = AdminServer(worker, loop_monitor, profiler)
+    await admin.start()
+    
+    while worker.is_running:
         try:
             print("🚀 Starting site generation worker...")
             await worker.poll_queue()
-        except KeyboardInterrupt:
-            print("👋 Received shutdown signal")
-            break
         except Exception as e:
             print(f"❌ Worker crashed: {e}")
             print("🔄 Restarting worker in 10 seconds...")
             await asyncio.sleep(10)
-        finally:
-            await worker.shutdown()
+    
+    # Jobs still running after a second signal would be cancelled by asyncio.run and
+    # left 'processing' forever; put them back in the queue first
+    await worker.release_in_flight()
+    await admin.stop()
+    await loop_monitor.stop()
+    print("👋 Worker stopped")
 
 def main():
     """Main entry point"""
-    # Setup signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
     print("🤖 DomainToBiz Site Generation Worker Starting...")
     
     # Run DNS and connectivity tests first
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+On-demand profiler for the live worker process.
+
+Send SIGUSR1 to capture a cProfile of the event loop thread, or SIGUSR2 to capture
+a sampling profile of all threads, for PROFILE_SECONDS. Results are written to
+PROFILE_DIR (.prof files load in pstats/snakeviz, .folded files in flamegraph tools).
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+class SamplingProfiler:
+    """Collects folded stacks of every thread at a fixed interval from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        """Write samples in folded-stack format"""
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class WorkerProfiler:
+    """Runs one profiling session at a time and writes the result to disk"""
+
+    def __init__(self, output_dir: str = None, default_seconds: float = None):
+        self.output_dir = output_dir or os.getenv('PROFILE_DIR', '/tmp/worker-profiles')
+        self.default_seconds = default_seconds or float(os.getenv('PROFILE_SECONDS', '30'))
+        self.active: Optional[Dict[str, Any]] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    def install_signal_handlers(self, loop: asyncio.AbstractEventLoop):
+        """Bind SIGUSR1/SIGUSR2 to profiling sessions"""
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.start, 'cprofile')
+            loop.add_signal_handler(signal.SIGUSR2, self.start, 'sampling')
+            logger.info(f"🔬 Profiler ready (SIGUSR1: cProfile, SIGUSR2: sampling, output: {self.output_dir})")
+        except (NotImplementedError, AttributeError, RuntimeError) as e:
+            logger.warning(f"⚠️ Profiler signal handlers unavailable: {e}")
+
+    def start(self, mode: str = 'cprofile', seconds: float = None) -> Dict[str, Any]:
+        """Start a profiling session on the running loop; returns the session description"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+
+        if self.active:
+            logger.warning(f"⚠️ Profiler already running ({self.active['mode']}), ignoring request")
+            return self.active
+
+        seconds = seconds or self.default_seconds
+        os.makedirs(self.output_dir, exist_ok=True)
+        extension = 'prof' if mode == 'cprofile' else 'folded'
+        path = os.path.join(self.output_dir, f"{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.{extension}")
+
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler()
+            profiler.start()
+
+        self.active = {
+            'mode': mode,
+            'seconds': seconds,
+            'path': path,
+            'started_at': time.time()
+        }
+        asyncio.get_running_loop().call_later(seconds, self._finish, profiler, path)
+        logger.info(f"🔬 Profiling ({mode}) for {seconds:g}s -> {path}")
+        return self.active
+
+    def _finish(self, profiler, path: str):
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                profiler.dump(path)
+            logger.info(f"🔬 Profile written to {path}")
+            self.last_result = {**self.active, 'finished_at': time.time()}
+        except Exception as e:
+            logger.error(f"❌ Failed to write profile: {e}")
+        finally:
+            self.active = None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint rate limiting for agent API calls, adjustable at runtime
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket; a rate of None means unlimited"""
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def capacity(self) -> float:
+        if self.burst:
+            return self.burst
+        return max(1.0, self.rate or 1.0)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            while self.rate:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class StageRateLimiter:
+    """
+    Rate limits keyed by stage name (one agent endpoint per stage).
+
+    Limits come from STAGE_RATE_LIMITS, e.g. "analyze=2,build=0.5" (requests per
+    second), and can be changed while requests are waiting.
+    """
+
+    def __init__(self, limits: Dict[str, Optional[float]] = None):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.waits: Dict[str, int] = {}
+        if limits is None:
+            limits = self.parse_limits(os.getenv('STAGE_RATE_LIMITS', ''))
+        for stage, rate in limits.items():
+            self.set_limit(stage, rate)
+
+    @staticmethod
+    def parse_limits(spec: str) -> Dict[str, float]:
+        limits = {}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            stage, _, rate = item.partition('=')
+            try:
+                limits[stage.strip()] = float(rate)
+            except ValueError:
+                logger.warning(f"⚠️ Ignoring invalid rate limit: {item}")
+        return limits
+
+    def set_limit(self, stage: str, rate: Optional[float]):
+        """Set requests/second for a stage; None or 0 removes the limit"""
+        rate = rate or None
+        bucket = self.buckets.get(stage)
+        if bucket:
+            bucket.rate = rate
+            bucket.tokens = min(bucket.tokens, bucket.capacity)
+        else:
+            self.buckets[stage] = TokenBucket(rate)
+        logger.info(f"🚦 Rate limit for {stage}: {f'{rate}/s' if rate else 'unlimited'}")
+
+    async def acquire(self, stage: str):
+        bucket = self.buckets.get(stage)
+        if not bucket or not bucket.rate:
+            return
+
+        started = time.monotonic()
+        await bucket.acquire()
+        if time.monotonic() - started > 0.01:
+            self.waits[stage] = self.waits.get(stage, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            stage: {'rate_per_second': bucket.rate, 'throttled_requests': self.waits.get(stage, 0)}
+            for stage, bucket in self.buckets.items()
+        }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Stage recording for deterministic replay (see replay.py).
+
+When RECORD_STAGES_PATH is set, the worker records one line per claimed job and
+one per agent request (stage, status, latency, payload sizes and response body),
+plus the built site files fed to asset optimization, as NDJSON. Each job's lines
+are appended as a self-contained gzip member when the job finishes, so a crash
+loses at most the jobs in flight and never corrupts what was already written.
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+GZIP_MAGIC = b'\x1f\x8b\x08'
+
+
+class StageRecorder:
+    """Buffers each job's records and appends them to the archive as one gzip member"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started_at = time.monotonic()
+        self.records = 0
+        self._pending: Dict[str, List[str]] = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        logger.info(f"⏺️ Recording stage traffic to {path}")
+
+    @classmethod
+    def from_env(cls) -> Optional['StageRecorder']:
+        path = os.getenv('RECORD_STAGES_PATH')
+        return cls(path) if path else None
+
+    def _write(self, record: Dict[str, Any]):
+        record['t'] = round(time.monotonic() - self.started_at, 3)
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        self.records += 1
+        lines = self._pending.get(record.get('job_id'))
+        if lines is not None:
+            lines.append(line)
+        else:
+            self._append([line])
+
+    def _append(self, lines: List[str]):
+        with open(self.path, 'ab') as f:
+            f.write(gzip.compress(''.join(lines).encode('utf-8')))
+
+    def finish_job(self, job_id: str):
+        """Write a finished (or cancelled) job's records"""
+        lines = self._pending.pop(job_id, None)
+        if lines:
+            self._append(lines)
+
+    def record_job(self, job: Dict[str, Any]):
+        self._pending[job['id']] = []
+        self._write({
+            'type': 'job',
+            'job_id': job['id'],
+            'domain': job['domain'],
+            'job_data': job.get('job_data') or {}
+        })
+
+    def record_stage(self, job_id: Optional[str], stage: str, response: httpx.Response, latency: float):
+        self._write({
+            'type': 'stage',
+            'job_id': job_id,
+            'stage': stage,
+            'path': response.request.url.path,
+            'status': response.status_code,
+            'latency': round(latency, 4),
+            'request_bytes': len(response.request.content),
+            'response_bytes': len(response.content),
+            'response': response.text
+        })
+
+    def record_site(self, job_id: Optional[str], website_id: str, row: Dict[str, Any]):
+        """Built site files, so replay can rerun asset optimization on the same input"""
+        self._write({
+            'type': 'site',
+            'job_id': job_id,
+            'website_id': website_id,
+            'website_html': row.get('website_html'),
+            'website_css': row.get('website_css'),
+            'website_js': row.get('website_js')
+        })
+
+    def close(self):
+        # Jobs still running are recorded as far as they got
+        for job_id in list(self._pending):
+            self.finish_job(job_id)
+
+
+def _read_members(path: str, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Decompressed gzip members of an archive, skipping truncated or corrupt ones"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    view = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        start = pos
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        parts = []
+        try:
+            while not decompressor.eof and pos < len(data):
+                chunk = view[pos:pos + chunk_size]
+                parts.append(decompressor.decompress(chunk))
+                pos += len(chunk) - len(decompressor.unused_data)
+        except zlib.error:
+            pass
+        if decompressor.eof:
+            yield b''.join(parts)
+            continue
+
+        # A member cut short by a crash mid-write: resume at the next member, if any
+        logger.warning(f"⚠️ Skipping a truncated or corrupt section of {path} at byte {start}")
+        pos = data.find(GZIP_MAGIC, start + 1)
+        if pos == -1:
+            return
+
+
+def load_recordings(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read an archive into {job_id: {'job', 'stages', 'sites'}} in recorded order"""
+    jobs: Dict[str, Dict[str, Any]] = defaultdict(lambda: {'job': None, 'stages': [], 'sites': []})
+    for member in _read_members(path):
+        for line in member.decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entry = jobs[record.get('job_id')]
+            if record['type'] == 'job':
+                entry['job'] = record
+            elif record['type'] == 'site':
+                entry['sites'].append(record)
+            else:
+                entry['stages'].append(record)
+
+    # Stage calls made outside a job (or for jobs whose start was not captured) can't be replayed
+    complete = {job_id: entry for job_id, entry in jobs.items() if job_id and entry['job']}
+    dropped = len(jobs) - len(complete)
+    if dropped:
+        logger.warning(f"⚠️ Ignoring {dropped} incomplete job recording(s)")
+    return complete
+
+
+def summarize(recordings: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Workload mix of an archive: jobs, stage counts and bytes"""
+    stages: Dict[str, List[float]] = defaultdict(list)
+    response_bytes = 0
+    for entry in recordings.values():
+        for stage in entry['stages']:
+            stages[stage['stage']].append(stage['latency'])
+            response_bytes += stage['response_bytes']
+    return {
+        'jobs': len(recordings),
+        'stage_calls': {stage: len(latencies) for stage, latencies in stages.items()},
+        'recorded_stage_seconds': {stage: round(sum(latencies), 1) for stage, latencies in stages.items()},
+        'response_bytes': response_bytes
+    }
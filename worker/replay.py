@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay of recorded worker traffic for performance regression checks.
+
+Record production traffic by running the worker with RECORD_STAGES_PATH set
+(see recording.py), then replay the archive against the current code:
+
+    python replay.py stages.ndjson.gz --output before.json
+    # ...change the worker...
+    python replay.py stages.ndjson.gz --output after.json --baseline before.json
+
+Every recorded job is queued at once and processed by a real SiteGenerationWorker
+(admission control, rate limits, deadlines, hedging and asset optimization all
+apply). Agent API calls are answered from the archive after the recorded latency
+times --scale; Supabase is replaced by an in-memory store, so database latency is
+not part of the measurement. The run reports throughput, job latency percentiles,
+peak RSS and event loop lag, and with --baseline prints the change per metric.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+# The worker refuses to start without an OpenAI key; replay never calls OpenAI
+os.environ.setdefault('OPENAI_API_KEY', 'replay')
+# Never append a replay to the archive being replayed
+os.environ.pop('RECORD_STAGES_PATH', None)
+# Queue maintenance would only touch the in-memory store
+os.environ['MAINTENANCE_ENABLED'] = 'false'
+
+from main import SiteGenerationWorker
+from jobs import InFlightJob, current_job
+from admission import get_rss_bytes
+from loop_monitor import LoopLagMonitor
+from recording import load_recordings, summarize
+
+logger = logging.getLogger('replay')
+logger.setLevel(logging.INFO)
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {
+    'throughput_jobs_per_min': True,
+    'wall_seconds': False,
+    'job_latency.p50': False,
+    'job_latency.p95': False,
+    'job_latency.p99': False,
+    'memory.peak_rss_mb': False,
+    'memory.rss_growth_mb': False,
+    'loop_lag.p99_ms': False,
+    'loop_lag.max_ms': False
+}
+
+
+class _Result:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class _MemoryQuery:
+    """The subset of the supabase-py query builder the worker uses"""
+
+    def __init__(self, store: 'MemorySupabase', table: str):
+        self.rows = store.tables[table]
+        self.filters = []
+        self.row_limit = None
+        self.values = None
+        self.inserted = None
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        allowed = set(values)
+        self.filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.rows = sorted(self.rows, key=lambda row: row.get(column) or '', reverse=desc)
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.values = values
+        return self
+
+    def insert(self, rows):
+        self.inserted = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self) -> _Result:
+        if self.inserted is not None:
+            for row in self.inserted:
+                self.rows.append({'id': str(uuid.uuid4()), **row})
+            return _Result(self.inserted)
+
+        matched = [row for row in self.rows if all(f(row) for f in self.filters)]
+        if self.values is not None:
+            for row in matched:
+                row.update(self.values)
+            return _Result(matched)
+        return _Result(matched[:self.row_limit] if self.row_limit else matched)
+
+
+class MemorySupabase:
+    """In-memory stand-in for the Supabase client so replays measure the worker, not the database"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.rpc_calls = 0
+
+    def table(self, name: str) -> _MemoryQuery:
+        return _MemoryQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> '_MemoryRpc':
+        self.rpc_calls += 1
+        handler = getattr(self, f"_rpc_{name}", None)
+        return _MemoryRpc(lambda: handler(**params) if handler else [])
+
+    def _rpc_dequeue_next_job(self, p_worker_id: str) -> List[Dict[str, Any]]:
+        queued = [row for row in self.tables['site_jobs'] if row['status'] == 'queued']
+        if not queued:
+            return []
+        job = min(queued, key=lambda row: (-row.get('priority', 0), row['created_at']))
+        job.update(status='processing', worker_id=p_worker_id, started_at=datetime.now(timezone.utc).isoformat())
+        return [{'job_id': job['id'], 'domain': job['domain'], 'job_data': job['job_data'],
+                 'user_id': job.get('user_id'), 'job_created_at': job['created_at'],
+                 'job_priority': job.get('priority', 0)}]
+
+    def _rpc_update_job_progress(self, p_job_id: str, p_step_name: str, p_status: str,
+                                 p_progress: int = 0, p_message: str = None, p_step_data=None) -> List[Dict[str, Any]]:
+        # Same job status transitions as update_job_progress in custom-queue-schema.sql
+        self.tables['site_job_progress'].append({
+            'job_id': p_job_id, 'step_name': p_step_name, 'status': p_status,
+            'progress_percentage': p_progress, 'message': p_message, 'step_data': p_step_data
+        })
+        for row in self.tables['site_jobs']:
+            if row['id'] != p_job_id:
+                continue
+            if p_status == 'failed':
+                row.update(status='failed', error_message=p_message)
+            elif p_status == 'completed' and p_progress == 100:
+                row.update(status='completed')
+        return []
+
+    def _rpc_merge_job_result(self, p_job_id: str, p_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        for row in self.tables['site_jobs']:
+            if row['id'] == p_job_id and row['status'] != 'cancelled':
+                row['result_data'] = {**(row.get('result_data') or {}), **p_result}
+        return []
+
+
+    def _rpc_release_job(self, p_job_id: str, p_worker_id: str, p_reason: str) -> List[Dict[str, Any]]:
+        for row in self.tables['site_jobs']:
+            if row['id'] == p_job_id and row['status'] == 'processing' and row.get('worker_id') == p_worker_id:
+                row.update(status='queued', error_message=p_reason, started_at=None, worker_id=None)
+                return [True]
+        return [False]
+
+
+class _MemoryRpc:
+    def __init__(self, call):
+        self.call = call
+
+    def execute(self) -> _Result:
+        return _Result(self.call())
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers agent API calls from the archive at the recorded latency times `scale`"""
+
+    def __init__(self, recordings: Dict[str, Dict[str, Any]], scale: float = 1.0):
+        self.scale = scale
+        self.unmatched = 0
+        self.responses: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for job_id, entry in recordings.items():
+            for record in entry['stages']:
+                self.responses[(job_id, record['path'])].append(record)
+        self.served: Dict[tuple, int] = defaultdict(int)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        job: Optional[InFlightJob] = current_job.get()
+        key = (job.job_id if job else None, request.url.path)
+        records = self.responses.get(key)
+        if not records:
+            self.unmatched += 1
+            return httpx.Response(404, json={'success': False, 'error': 'no recording for this request'})
+
+        # Repeated calls (retries, hedges) get the next recording, then the last one again
+        index = min(self.served[key], len(records) - 1)
+        self.served[key] += 1
+        record = records[index]
+
+        await asyncio.sleep(record['latency'] * self.scale)
+        return httpx.Response(record['status'], content=record['response'].encode('utf-8'),
+                              headers={'content-type': 'application/json'})
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 3)
+
+
+def seed_store(store: MemorySupabase, recordings: Dict[str, Dict[str, Any]]):
+    """Queue every recorded job as of now, with the site files its build produced"""
+    created_at = datetime.now(timezone.utc).isoformat()
+    for job_id, entry in recordings.items():
+        job_data = dict(entry['job']['job_data'])
+        # Absolute deadlines from the recording have long passed; relative ones still apply
+        job_data.pop('deadlineAt', None)
+        store.tables['site_jobs'].append({
+            'id': job_id,
+            'domain': entry['job']['domain'],
+            'status': 'queued',
+            'job_data': job_data,
+            'priority': 0,
+            'created_at': created_at
+        })
+        for site in entry['sites']:
+            store.tables['generated_websites'].append({
+                'id': site['website_id'],
+                'website_html': site['website_html'],
+                'website_css': site['website_css'],
+                'website_js': site['website_js']
+            })
+
+
+async def replay(recordings: Dict[str, Dict[str, Any]], scale: float = 1.0,
+                 concurrency: Optional[int] = None, sample_interval: float = 0.1) -> Dict[str, Any]:
+    """Run all recorded jobs through a fresh worker and collect performance metrics"""
+    store = MemorySupabase()
+    seed_store(store, recordings)
+
+    worker = SiteGenerationWorker(supabase=store)
+    worker.http_transport = ReplayTransport(recordings, scale)
+    if concurrency:
+        worker.set_concurrency(concurrency)
+
+    latencies: List[float] = []
+    finish_job = worker.finish_job
+
+    def record_finish(in_flight: InFlightJob):
+        if in_flight.job_id in worker.in_flight:
+            latencies.append(in_flight.elapsed)
+        finish_job(in_flight)
+
+    worker.finish_job = record_finish
+
+    loop_monitor = LoopLagMonitor(report_interval=0)
+    loop_monitor.start()
+    baseline_rss = peak_rss = get_rss_bytes()
+    total = len(recordings)
+    started = time.monotonic()
+    poller = asyncio.create_task(worker.poll_queue(), name='replay-poller')
+
+    try:
+        while len(latencies) < total:
+            if poller.done():
+                poller.result()
+                break
+            peak_rss = max(peak_rss, get_rss_bytes())
+            await asyncio.sleep(sample_interval)
+        wall_seconds = time.monotonic() - started
+    finally:
+        worker.is_running = False
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        await loop_monitor.stop()
+
+    statuses = defaultdict(int)
+    for row in store.tables['site_jobs']:
+        statuses[row['status']] += 1
+    lag = loop_monitor.snapshot()['histogram']
+
+    return {
+        'recorded_at': datetime.now().isoformat(),
+        'jobs': total,
+        'statuses': dict(statuses),
+        'scale': scale,
+        'concurrency': worker.admission.max_concurrency,
+        'wall_seconds': round(wall_seconds, 2),
+        'throughput_jobs_per_min': round(total / max(wall_seconds, 1e-6) * 60, 2),
+        'job_latency': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': round(max(latencies), 3) if latencies else 0.0
+        },
+        'memory': {
+            'baseline_rss_mb': round(baseline_rss / 1024 / 1024, 1),
+            'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+            'rss_growth_mb': round((peak_rss - baseline_rss) / 1024 / 1024, 1)
+        },
+        'loop_lag': {
+            'p99_ms': round(lag['p99_ms'], 2),
+            'max_ms': lag['max_ms'],
+            'stalls': loop_monitor.stalls
+        },
+        'unmatched_requests': worker.http_transport.unmatched
+    }
+
+
+def _metric(results: Dict[str, Any], name: str) -> Optional[float]:
+    value: Any = results
+    for part in name.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def diff_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-metric change from baseline to current; `regressed` follows each metric's direction"""
+    rows = []
+    for name, higher_is_better in COMPARED_METRICS.items():
+        before, after = _metric(baseline, name), _metric(current, name)
+        if before is None or after is None:
+            continue
+        change = ((after - before) / before * 100) if before else 0.0
+        rows.append({
+            'metric': name,
+            'baseline': before,
+            'current': after,
+            'change_percent': round(change, 1),
+            'regressed': after < before if higher_is_better else after > before
+        })
+    return rows
+
+
+def format_diff(rows: List[Dict[str, Any]], tolerance: float) -> str:
+    lines = [f"{'metric':<26}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for row in rows:
+        flag = '  ⚠️' if row['regressed'] and abs(row['change_percent']) > tolerance else ''
+        lines.append(f"{row['metric']:<26}{row['baseline']:>12}{row['current']:>12}"
+                     f"{row['change_percent']:>+9.1f}%{flag}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Replay recorded agent traffic through the worker and report performance')
+    parser.add_argument('archive', help='Recording written with RECORD_STAGES_PATH (.ndjson.gz)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply recorded latencies (0 = no waiting)')
+    parser.add_argument('--concurrency', type=int, default=None, help='Override WORKER_CONCURRENCY')
+    parser.add_argument('--output', default=None, help='Write results JSON here (use as a later --baseline)')
+    parser.add_argument('--baseline', default=None, help='Results JSON of an earlier replay to compare against')
+    parser.add_argument('--tolerance', type=float, default=5.0,
+                        help='Percent change a metric may regress before it is flagged and the exit code is 1')
+    parser.add_argument('--verbose', action='store_true', help='Keep the worker\'s own logging')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    recordings = load_recordings(args.archive)
+    if not recordings:
+        logger.error(f"❌ No replayable jobs in {args.archive}")
+        sys.exit(1)
+    logger.info(f"▶️ Replaying {args.archive}: {json.dumps(summarize(recordings))}")
+
+    results = asyncio.run(replay(recordings, scale=args.scale, concurrency=args.concurrency))
+    results['archive'] = os.path.abspath(args.archive)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != results['scale'] or baseline.get('concurrency') != results['concurrency']:
+            logger.warning("⚠️ Baseline was replayed with a different scale or concurrency")
+        rows = diff_results(baseline, results)
+        print(format_diff(rows, args.tolerance))
+        if any(row['regressed'] and abs(row['change_percent']) > args.tolerance for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Post-build optimization of generated website assets.
+
+Minifies HTML/CSS/JS, inlines small stylesheets into the page, names external
+assets by content hash for cache-busting, and produces gzip and brotli variants
+so they can be served straight from storage.
+"""
+
+import re
+import gzip
+import base64
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional faster/safer minifiers and brotli; fall back gracefully when missing
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Stylesheets up to this size are inlined so the first paint needs no extra request
+# (roughly what fits in the first TCP round trip next to the HTML)
+CRITICAL_CSS_INLINE_BYTES = 14 * 1024
+
+# Variants smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HTML_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'css': 'text/css; charset=utf-8',
+    'js': 'application/javascript; charset=utf-8'
+}
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_RAW_BLOCKS = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+_HTML_COMMENTS = re.compile(r'<!--(?!\[if|\s*<!\[endif).*?-->', re.S)
+# Whitespace around document and head-only tags never renders, so it can be dropped entirely.
+# Body elements keep a single space: any of them may be styled inline-block or inline-flex
+_HEAD_TAGS = re.compile(r'\s*(</?(?:html|head|body|meta|link|title|base)\b[^>]*>)\s*', re.I)
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet"""
+    if rcssmin:
+        return rcssmin.cssmin(css)
+
+    # Keep string literals intact, drop comments
+    css = _CSS_TOKENS.sub(lambda m: m.group(1) or '', css)
+    strings: List[str] = []
+
+    def stash(match):
+        strings.append(match.group(0))
+        return f"\x00{len(strings) - 1}\x00"
+
+    css = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', stash, css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # Only after the colon: "a :hover" and "a:hover" are different selectors
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    css = re.sub(r'\x00(\d+)\x00', lambda m: strings[int(m.group(1))], css)
+    return css.strip()
+
+
+def minify_js(js: str) -> str:
+    """Minify JavaScript with rjsmin when available; otherwise only trim trailing whitespace"""
+    if rjsmin:
+        return rjsmin.jsmin(js)
+    # Without a tokenizer anything more risks breaking strings, regexes and template literals
+    return '\n'.join(line.rstrip() for line in js.strip().splitlines())
+
+
+def minify_html(html: str) -> str:
+    """Collapse whitespace and drop comments; minify inline <style> and <script>"""
+    blocks: List[str] = []
+
+    def stash(match):
+        open_tag, tag, body, close_tag = match.groups()
+        tag = tag.lower()
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script' and 'src=' not in open_tag.lower():
+            body = minify_js(body)
+        blocks.append(open_tag + body + close_tag)
+        return f"\x00{len(blocks) - 1}\x00"
+
+    html = _RAW_BLOCKS.sub(stash, html)
+    html = _HTML_COMMENTS.sub('', html)
+    html = re.sub(r'\s+', ' ', html)
+    html = _HEAD_TAGS.sub(r'\1', html)
+    html = re.sub(r'\x00(\d+)\x00', lambda m: blocks[int(m.group(1))], html)
+    return html.strip()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _variants(file_name: str, file_type: str, data: bytes, cache_control: str) -> List[Dict[str, Any]]:
+    """Identity, gzip and brotli variants of one file"""
+    digest = content_hash(data)
+    base = {
+        'file_name': file_name,
+        'file_type': file_type,
+        'content_type': CONTENT_TYPES[file_type],
+        'content_hash': digest,
+        'cache_control': cache_control,
+        'original_size': len(data)
+    }
+    variants = [{**base, 'content_encoding': 'identity', 'content': data}]
+
+    if len(data) >= MIN_COMPRESS_BYTES:
+        # mtime=0 keeps the gzip output deterministic for identical content
+        variants.append({**base, 'content_encoding': 'gzip', 'content': gzip.compress(data, compresslevel=9, mtime=0)})
+        if brotli:
+            variants.append({**base, 'content_encoding': 'br', 'content': brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)})
+
+    return variants
+
+
+def _replace_asset_reference(html: str, original: str, replacement: str) -> str:
+    return re.sub(r'''((?:href|src)=["'](?:\./|/)?)''' + re.escape(original) + r'''(["'])''',
+                  lambda m: m.group(1) + replacement + m.group(2), html)
+
+
+def _inline_stylesheet(html: str, css: str, file_name: str) -> Optional[str]:
+    """Replace <link href=file_name> with an inline <style>; None if the page does not link it"""
+    link = re.compile(r'''<link\b[^>]*href=["'](?:\./|/)?''' + re.escape(file_name) + r'''["'][^>]*>''', re.I)
+    if not link.search(html):
+        return None
+    return link.sub(lambda _: f"<style>{css}</style>", html, count=1)
+
+
+def optimize_site(html: str, css: Optional[str] = None, js: Optional[str] = None,
+                  css_name: str = 'styles.css', js_name: str = 'script.js') -> Dict[str, Any]:
+    """
+    Build optimized artifacts for a generated site.
+
+    Returns the file variants to store and a manifest (file names, hashes, sizes)
+    small enough to keep in the job result.
+    """
+    files: List[Dict[str, Any]] = []
+    original_bytes = sum(len(part.encode('utf-8')) for part in (html, css, js) if part)
+
+    if css:
+        css_min = minify_css(css)
+        inlined = None
+        if len(css_min.encode('utf-8')) <= CRITICAL_CSS_INLINE_BYTES:
+            inlined = _inline_stylesheet(html, css_min, css_name)
+        if inlined is not None:
+            html = inlined
+        else:
+            data = css_min.encode('utf-8')
+            hashed_name = f"styles.{content_hash(data)}.css"
+            html = _replace_asset_reference(html, css_name, hashed_name)
+            files += _variants(hashed_name, 'css', data, IMMUTABLE_CACHE_CONTROL)
+
+    if js:
+        data = minify_js(js).encode('utf-8')
+        hashed_name = f"script.{content_hash(data)}.js"
+        html = _replace_asset_reference(html, js_name, hashed_name)
+        files += _variants(hashed_name, 'js', data, IMMUTABLE_CACHE_CONTROL)
+
+    # The page itself keeps a stable name and is revalidated; its assets are immutable
+    files += _variants('index.html', 'html', minify_html(html).encode('utf-8'), HTML_CACHE_CONTROL)
+
+    identity = [f for f in files if f['content_encoding'] == 'identity']
+    manifest = {
+        'files': {
+            f['file_name']: {
+                'hash': f['content_hash'],
+                'size': f['original_size'],
+                'encodings': {v['content_encoding']: len(v['content']) for v in files if v['file_name'] == f['file_name']}
+            }
+            for f in identity
+        },
+        'original_bytes': original_bytes,
+        'minified_bytes': sum(f['original_size'] for f in identity),
+        'brotli': brotli is not None
+    }
+    return {'files': files, 'manifest': manifest}
+
+
+def to_website_file_rows(website_id: str, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """website_files rows for optimized variants; compressed bytes are stored base64-encoded"""
+    rows = []
+    for f in files:
+        if f['content_encoding'] == 'identity':
+            content = f['content'].decode('utf-8')
+        else:
+            content = base64.b64encode(f['content']).decode('ascii')
+        rows.append({
+            'website_id': website_id,
+            'file_name': f['file_name'],
+            'file_type': f['file_type'],
+            'file_content': content,
+            'content_encoding': f['content_encoding'],
+            'content_hash': f['content_hash'],
+            'content_type': f['content_type'],
+            'cache_control': f['cache_control'],
+            'byte_size': len(f['content'])
+        })
+    return rows
@@ -98,6 +98,11 @@ class SupabaseTable:
         self._filters.append(f"{column}=eq.{value}")
         return self
     
+    def in_(self, column: str, values: List[Any]):
+        """Add membership filter"""
+        self._filters.append(f"{column}=in.({','.join(str(v) for v in values)})")
+        return self
+    
     def order(self, column: str, desc: bool = False):
         """Add ordering"""
         direction = 'desc' if desc else 'asc'
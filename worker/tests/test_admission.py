@@ -0,0 +1,71 @@
+import admission
+from admission import MB, AdmissionController
+from jobs import InFlightJob
+
+
+def make_controller(monkeypatch, rss_mb=100, **overrides):
+    monkeypatch.setattr(admission, 'get_rss_bytes', lambda: int(rss_mb * MB))
+    options = dict(max_concurrency=4, memory_watermark_mb=400, job_reserve_mb=50, payload_memory_factor=4)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def make_job(payload_mb=0.0):
+    job = InFlightJob(job_id='job', domain='example.com')
+    if payload_mb:
+        job.record_payload('analyze', int(payload_mb * MB))
+    return job
+
+
+def test_budget_subtracts_rss_and_outstanding_reservations(monkeypatch):
+    controller = make_controller(monkeypatch)
+    assert controller.budget_bytes([]) == 300 * MB
+    assert controller.budget_bytes([make_job(), make_job()]) == 200 * MB
+
+
+def test_payload_memory_counts_against_the_reservation(monkeypatch):
+    controller = make_controller(monkeypatch)
+    # 5MB on the wire is 20MB in memory, so 30MB of the 50MB reservation is still outstanding
+    assert controller.budget_bytes([make_job(5)]) == 270 * MB
+    # A job past its reservation holds nothing extra back
+    assert controller.budget_bytes([make_job(20)]) == 300 * MB
+
+
+def test_admits_while_under_limits(monkeypatch):
+    controller = make_controller(monkeypatch)
+    assert controller.can_admit([make_job()]) == (True, 'ok')
+    assert controller.rejections == 0
+
+
+def test_rejects_at_concurrency_limit(monkeypatch):
+    controller = make_controller(monkeypatch, max_concurrency=2)
+    admit, reason = controller.can_admit([make_job(), make_job()])
+    assert not admit
+    assert 'concurrency limit' in reason
+
+
+def test_rejects_when_memory_budget_is_exhausted(monkeypatch):
+    controller = make_controller(monkeypatch, rss_mb=320)
+    admit, reason = controller.can_admit([make_job()])
+    assert not admit
+    assert 'memory budget' in reason
+    assert controller.rejections == 1
+
+
+def test_expected_job_bytes_follows_observed_peaks(monkeypatch):
+    controller = make_controller(monkeypatch)
+    assert controller.expected_job_bytes == 50 * MB
+
+    controller.record_job_finished(make_job(25))
+    assert controller.expected_job_bytes == 100 * MB
+
+    controller.record_job_finished(make_job(0))
+    assert controller.expected_job_bytes == 80 * MB
+
+
+def test_release_payload_frees_one_stage():
+    job = make_job(5)
+    job.record_payload('strategy', 2 * MB)
+    job.release_payload('analyze')
+    assert job.payload_bytes == 2 * MB
+    assert job.peak_payload_bytes == 7 * MB
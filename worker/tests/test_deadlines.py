@@ -0,0 +1,107 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from deadlines import DEFAULT_STAGE_MIN_SECONDS, DeadlineExceeded, JobDeadline
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+@pytest.fixture(autouse=True)
+def deadline_env(monkeypatch):
+    monkeypatch.delenv('STAGE_MIN_SECONDS', raising=False)
+    monkeypatch.delenv('STAGE_TIMEOUTS', raising=False)
+    monkeypatch.setenv('PLAN_DEADLINE_SECONDS', 'free=900,pro=600')
+    monkeypatch.setenv('JOB_DEADLINE_SECONDS', '1200')
+
+
+def test_deadline_at_takes_precedence():
+    created = time.time()
+    job = {'created_at': iso(created), 'job_data': {'deadlineAt': iso(created + 60), 'deadlineSeconds': 300}}
+    assert JobDeadline.for_job(job, plan='pro').expires_at == pytest.approx(created + 60)
+
+
+def test_deadline_seconds_counts_from_submission():
+    created = time.time() - 100
+    job = {'created_at': iso(created), 'job_data': {'deadlineSeconds': '300'}}
+    assert JobDeadline.for_job(job, plan='pro').expires_at == pytest.approx(created + 300)
+
+
+@pytest.mark.parametrize('value', ['soon', 0, -5, [1]])
+def test_invalid_deadline_seconds_falls_back_to_plan(value):
+    created = time.time()
+    job = {'created_at': iso(created), 'job_data': {'deadlineSeconds': value}}
+    assert JobDeadline.for_job(job, plan='pro').expires_at == pytest.approx(created + 600)
+
+
+def test_unknown_plan_uses_job_default():
+    created = time.time()
+    job = {'created_at': iso(created), 'job_data': {}}
+    assert JobDeadline.for_job(job, plan='enterprise').expires_at == pytest.approx(created + 1200)
+    assert JobDeadline.for_job(job).expires_at == pytest.approx(created + 1200)
+
+
+def test_stage_min_seconds_can_be_overridden(monkeypatch):
+    monkeypatch.setenv('STAGE_MIN_SECONDS', 'build=60,bad')
+    deadline = JobDeadline.for_job({'job_data': {}})
+    assert deadline.stage_min_seconds['build'] == 60
+    assert deadline.stage_min_seconds['analyze'] == DEFAULT_STAGE_MIN_SECONDS['analyze']
+
+
+def test_reserve_after_sums_later_stages():
+    deadline = JobDeadline(time.time() + 600)
+    assert deadline.reserve_after('content') == DEFAULT_STAGE_MIN_SECONDS['build']
+    assert deadline.reserve_after('build') == 0
+    assert deadline.reserve_after('analyze') == sum(DEFAULT_STAGE_MIN_SECONDS.values()) - DEFAULT_STAGE_MIN_SECONDS['analyze']
+
+
+def test_stage_timeout_splits_remaining_budget_by_nominal_timeouts():
+    deadline = JobDeadline(time.time() + 300)
+    # content (120s) and build (300s) are left: content gets 120/420 of the 300s
+    assert deadline.stage_timeout('content', 120) == pytest.approx(300 * 120 / 420, abs=1)
+    # The last stage gets everything that is left, up to its own timeout
+    assert deadline.stage_timeout('build', 300) == pytest.approx(300, abs=1)
+    assert deadline.stage_timeout('build', 120) == 120
+
+
+def test_fresh_job_keeps_nominal_timeouts():
+    deadline = JobDeadline(time.time() + 3600)
+    assert deadline.stage_timeout('analyze', 120) == 120
+    assert deadline.stage_timeout('build', 300) == 300
+
+
+def test_slow_early_stages_leave_build_its_share():
+    # Under the 600s pro default, an analyze stage that used most of its 120s timeout
+    # must not let strategy, design and content take everything but build's 30s minimum
+    deadline = JobDeadline(time.time() + 480)
+    spent = 0.0
+    for stage in ('strategy', 'design', 'content'):
+        deadline.expires_at -= spent
+        spent = deadline.stage_timeout(stage, 120)
+    deadline.expires_at -= spent
+    assert deadline.stage_timeout('build', 300) >= 150
+
+
+def test_share_is_raised_to_the_stage_minimum():
+    # The proportional share (46 * 120/420) is below content's 15s minimum
+    deadline = JobDeadline(time.time() + 46)
+    assert deadline.stage_timeout('content', 120) == pytest.approx(15, abs=1)
+
+
+def test_stage_timeouts_can_be_overridden(monkeypatch):
+    monkeypatch.setenv('STAGE_TIMEOUTS', 'build=900')
+    deadline = JobDeadline.for_job({'job_data': {}})
+    assert deadline.stage_timeouts['build'] == 900
+    assert deadline.stage_timeouts['content'] == 120
+
+
+def test_infeasible_stage_raises():
+    deadline = JobDeadline(time.time() + 40)
+    deadline.ensure_feasible('build')
+    with pytest.raises(DeadlineExceeded):
+        deadline.ensure_feasible('content')
+    with pytest.raises(DeadlineExceeded):
+        deadline.stage_timeout('content', 120)
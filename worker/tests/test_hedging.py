@@ -0,0 +1,145 @@
+import asyncio
+
+import httpx
+
+from hedging import HedgePolicy, hedged_request
+
+
+def make_policy(**overrides):
+    options = dict(stages='analyze', percentile=95, budget_percent=50, window=100, min_samples=5, min_delay=0.0)
+    options.update(overrides)
+    return HedgePolicy(**options)
+
+
+def test_no_delay_until_enough_samples():
+    policy = make_policy()
+    for latency in (1, 2, 3, 4):
+        policy.record('analyze', latency)
+    assert policy.hedge_delay('analyze') is None
+
+    policy.record('analyze', 5)
+    assert policy.hedge_delay('analyze') == 5
+
+
+def test_delay_is_the_configured_percentile():
+    policy = make_policy(percentile=90)
+    for latency in range(1, 21):
+        policy.record('analyze', float(latency))
+    assert policy.hedge_delay('analyze') == 18.0
+
+
+def test_delay_respects_min_delay():
+    policy = make_policy(min_delay=2.5)
+    for _ in range(10):
+        policy.record('analyze', 0.1)
+    assert policy.hedge_delay('analyze') == 2.5
+
+
+def test_only_configured_stages_are_hedged():
+    policy = make_policy()
+    for _ in range(10):
+        policy.record('design', 1.0)
+    assert policy.hedge_delay('design') is None
+
+
+def test_non_idempotent_stages_are_never_hedged():
+    policy = make_policy(stages='analyze,build,content')
+    assert policy.stages == {'analyze'}
+
+
+def test_budget_limits_hedges():
+    policy = make_policy(budget_percent=25)
+    policy.tokens = 0.0
+
+    for _ in range(3):
+        policy.on_request()
+    assert not policy.try_spend()
+
+    policy.on_request()
+    assert policy.try_spend()
+    assert not policy.try_spend()
+    assert policy.hedges == 1
+
+
+def test_budget_is_capped():
+    policy = make_policy(budget_percent=100)
+    for _ in range(1000):
+        policy.on_request()
+    assert policy.tokens == policy.max_tokens
+
+
+def test_fast_primary_is_not_hedged():
+    policy = make_policy()
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return httpx.Response(200)
+
+    response, backup_won = asyncio.run(hedged_request(policy, 'analyze', send, delay=1.0))
+    assert response.status_code == 200
+    assert not backup_won
+    assert len(calls) == 1
+    assert policy.hedges == 0
+
+
+def test_backup_wins_and_slow_primary_is_cancelled():
+    policy = make_policy()
+    started = []
+    cancelled = []
+
+    async def send():
+        attempt = len(started)
+        started.append(attempt)
+        try:
+            await asyncio.sleep(10 if attempt == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return httpx.Response(200, json={'attempt': attempt})
+
+    async def run():
+        result = await hedged_request(policy, 'analyze', send, delay=0.05)
+        # Let the cancellation reach the losing task
+        await asyncio.sleep(0)
+        return result
+
+    response, backup_won = asyncio.run(run())
+    assert backup_won
+    assert response.json() == {'attempt': 1}
+    assert cancelled == [0]
+    assert policy.hedges == 1
+    assert policy.hedge_wins == 1
+
+
+def test_no_hedge_without_budget():
+    policy = make_policy()
+    policy.tokens = 0.0
+    started = []
+
+    async def send():
+        started.append(1)
+        await asyncio.sleep(0.1)
+        return httpx.Response(200)
+
+    response, backup_won = asyncio.run(hedged_request(policy, 'analyze', send, delay=0.01))
+    assert response.status_code == 200
+    assert not backup_won
+    assert len(started) == 1
+
+
+def test_failed_backup_falls_back_to_primary():
+    policy = make_policy()
+    started = []
+
+    async def send():
+        attempt = len(started)
+        started.append(attempt)
+        if attempt == 1:
+            raise httpx.ConnectError('backup failed')
+        await asyncio.sleep(0.1)
+        return httpx.Response(200)
+
+    response, backup_won = asyncio.run(hedged_request(policy, 'analyze', send, delay=0.01))
+    assert response.status_code == 200
+    assert not backup_won
@@ -0,0 +1,75 @@
+import pytest
+
+from ingest import enqueue_batch, ingest, normalize_domain, parse_args
+from supabase_http import SupabaseResponse
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Example.com', 'example.com'),
+    ('  https://www.Example.com/path?q=1  ', 'example.com'),
+    ('http://user@shop.example.co.uk:8080/', 'shop.example.co.uk'),
+    ('example.com.', 'example.com'),
+    ('bücher.de', 'xn--bcher-kva.de'),
+])
+def test_normalizes_domains(value, expected):
+    assert normalize_domain(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', None, 'localhost', 'not a domain', '-bad.com', '192.168.0.1', 'a..com'])
+def test_rejects_non_domains(value):
+    assert normalize_domain(value) is None
+
+
+class FakeBatchClient:
+    """Stands in for the HTTP fallback client: rpc() runs at once and returns the response"""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        domains = [job['domain'] for job in params['p_jobs']]
+        inserted = [d for d in domains if d not in self.existing]
+        self.existing.update(inserted)
+        return SupabaseResponse([{'inserted': len(inserted), 'skipped': len(domains) - len(inserted)}])
+
+
+class FakeBuilderClient(FakeBatchClient):
+    """supabase-py style: rpc() returns a builder that runs on execute()"""
+
+    def rpc(self, name, params):
+        response = super().rpc(name, params)
+        return type('Builder', (), {'execute': lambda _: response})()
+
+
+@pytest.mark.parametrize('client_class', [FakeBatchClient, FakeBuilderClient])
+def test_enqueue_batch_with_either_client(client_class):
+    client = client_class(existing={'taken.com'})
+    result = enqueue_batch(client, ['new.com', 'taken.com'], -10, {'source': 'bulk_ingest'}, None)
+
+    assert result == {'inserted': 1, 'skipped': 1}
+    name, params = client.calls[0]
+    assert name == 'enqueue_site_generation_batch'
+    assert params['p_priority'] == -10
+    job = params['p_jobs'][0]
+    assert job['job_data']['domain'] == 'new.com'
+    assert job['job_data']['source'] == 'bulk_ingest'
+
+
+def test_ingest_batches_dedupes_and_resumes(tmp_path):
+    source = tmp_path / 'domains.csv'
+    source.write_text('domain\nexample.com\nhttps://www.example.com/\nnot a domain\nshop.io\ntaken.com\nnew.dev\n')
+    client = FakeBatchClient(existing={'taken.com'})
+    args = parse_args([str(source), '--batch-size', '2', '--deadline-seconds', '3600'])
+
+    counters = ingest(args, supabase=client)
+
+    assert counters == {'rows_processed': 6, 'inserted': 3, 'skipped_existing': 1, 'duplicates': 1, 'invalid': 1}
+    assert [len(params['p_jobs']) for _, params in client.calls] == [2, 2]
+    assert client.calls[0][1]['p_jobs'][0]['job_data']['deadlineSeconds'] == 3600
+
+    # A rerun of the same file resumes after the last checkpoint and sends nothing
+    client.calls.clear()
+    assert ingest(args, supabase=client)['inserted'] == 3
+    assert client.calls == []
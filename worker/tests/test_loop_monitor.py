@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from loop_monitor import LagHistogram, LoopLagMonitor
+
+
+def test_samples_land_in_their_bucket():
+    histogram = LagHistogram([1, 10, 100])
+    for lag_ms in (0.5, 1, 7, 100, 250):
+        histogram.observe(lag_ms)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.total == 5
+    assert histogram.max_ms == 250
+
+
+def test_percentile_is_bucket_upper_bound():
+    histogram = LagHistogram([1, 10, 100])
+    for _ in range(90):
+        histogram.observe(0.2)
+    for _ in range(9):
+        histogram.observe(40)
+    histogram.observe(500)
+
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(95) == 100
+
+
+def test_percentile_is_capped_by_max_and_overflow_uses_max():
+    histogram = LagHistogram([1, 10, 100])
+    histogram.observe(3)
+    assert histogram.percentile(99) == 3
+
+    histogram.observe(5000)
+    assert histogram.percentile(99) == 5000
+
+
+def test_empty_snapshot():
+    snapshot = LagHistogram([1, 10]).snapshot()
+    assert snapshot['count'] == 0
+    assert snapshot['avg_ms'] == 0.0
+    assert snapshot['p99_ms'] == 0.0
+    assert snapshot['buckets'] == {'le_1ms': 0, 'le_10ms': 0, 'inf': 0}
+
+
+def test_monitor_reports_blocking_call():
+    monitor = LoopLagMonitor(interval=0.01, threshold_ms=50, report_interval=0)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+
+    assert monitor.stalls >= 1
+    assert monitor.histogram.max_ms >= 200
+    assert 'test_monitor_reports_blocking_call' in monitor.last_stall['stack']
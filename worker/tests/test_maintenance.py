@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from maintenance import LEASE_NAME, MaintenanceRunner
+from supabase_http import SupabaseResponse
+
+
+class FakeMaintenanceClient:
+    """HTTP-fallback style client: rpc() runs at once and returns the response"""
+
+    def __init__(self, batches, lease_grants=None):
+        self.batches = list(batches)
+        self.lease_grants = list(lease_grants) if lease_grants is not None else None
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if name == 'acquire_worker_lease':
+            granted = self.lease_grants.pop(0) if self.lease_grants else self.lease_grants is None
+            return SupabaseResponse(granted)
+        if name == 'archive_finished_jobs':
+            archived = self.batches.pop(0) if self.batches else 0
+            return SupabaseResponse([{'jobs_archived': archived, 'progress_rows_collapsed': archived * 7}])
+        return SupabaseResponse(True)
+
+    def count(self, name):
+        return sum(1 for call, _ in self.calls if call == name)
+
+
+@pytest.fixture(autouse=True)
+def maintenance_env(monkeypatch):
+    monkeypatch.setenv('ARCHIVE_BATCH_SIZE', '10')
+    monkeypatch.setenv('ARCHIVE_MAX_BATCHES', '4')
+    monkeypatch.setenv('ARCHIVE_BATCH_PAUSE', '0')
+    monkeypatch.setenv('ARCHIVE_AFTER_DAYS', '14')
+
+
+def test_archives_batches_until_a_short_one():
+    client = FakeMaintenanceClient([10, 10, 3])
+    runner = MaintenanceRunner(client, 'worker-1')
+
+    run = asyncio.run(runner.run_once())
+
+    assert run['batches'] == 3
+    assert run['jobs_archived'] == 23
+    assert run['progress_rows_collapsed'] == 161
+    assert runner.totals == {'runs': 1, 'jobs_archived': 23, 'progress_rows_collapsed': 161}
+    assert client.calls[1] == ('archive_finished_jobs', {'p_older_than_days': 14, 'p_batch_size': 10})
+
+
+def test_stops_at_max_batches():
+    client = FakeMaintenanceClient([10] * 10)
+    run = asyncio.run(MaintenanceRunner(client, 'worker-1').run_once())
+
+    assert run['batches'] == 4
+    assert run['jobs_archived'] == 40
+
+
+def test_skips_run_without_the_lease():
+    client = FakeMaintenanceClient([10], lease_grants=[False])
+    runner = MaintenanceRunner(client, 'worker-2')
+
+    assert asyncio.run(runner.run_once()) is None
+    assert client.count('archive_finished_jobs') == 0
+    assert not runner.is_leader
+
+
+def test_stops_when_the_lease_is_lost_mid_run():
+    client = FakeMaintenanceClient([10, 10, 10], lease_grants=[True, True, False])
+    runner = MaintenanceRunner(client, 'worker-1')
+
+    run = asyncio.run(runner.run_once())
+
+    assert run['batches'] == 2
+    assert not runner.is_leader
+    # The lease is renewed before every batch after the first
+    assert [name for name, _ in client.calls] == [
+        'acquire_worker_lease', 'archive_finished_jobs',
+        'acquire_worker_lease', 'archive_finished_jobs',
+        'acquire_worker_lease'
+    ]
+
+
+def test_lease_is_released_only_by_the_leader():
+    client = FakeMaintenanceClient([0])
+    runner = MaintenanceRunner(client, 'worker-1')
+    runner.release_lease()
+    assert client.count('release_worker_lease') == 0
+
+    asyncio.run(runner.run_once())
+    runner.release_lease()
+    assert client.calls[-1] == ('release_worker_lease', {'p_name': LEASE_NAME, 'p_holder': 'worker-1'})
+    assert not runner.is_leader
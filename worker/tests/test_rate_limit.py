@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from rate_limit import StageRateLimiter, TokenBucket
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(None)
+
+    async def run():
+        for _ in range(100):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 0.1
+
+
+def test_capacity_defaults_to_one_second_of_requests():
+    assert TokenBucket(5).capacity == 5
+    assert TokenBucket(0.5).capacity == 1
+    assert TokenBucket(5, burst=2).capacity == 2
+
+
+def test_bucket_spaces_requests_at_its_rate():
+    bucket = TokenBucket(20, burst=1)
+
+    async def run():
+        for _ in range(5):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    # The first request uses the initial token, the other four wait 50ms each
+    assert 0.18 <= time.monotonic() - started < 0.5
+
+
+def test_parse_limits_skips_invalid_entries():
+    limits = StageRateLimiter.parse_limits(' analyze=2, build=0.5,,design=fast ')
+    assert limits == {'analyze': 2.0, 'build': 0.5}
+
+
+def test_set_limit_updates_and_removes_limits():
+    limiter = StageRateLimiter({'analyze': 10})
+    bucket = limiter.buckets['analyze']
+
+    limiter.set_limit('analyze', 2)
+    assert limiter.buckets['analyze'] is bucket
+    assert bucket.rate == 2
+    assert bucket.tokens <= bucket.capacity
+
+    limiter.set_limit('analyze', 0)
+    assert bucket.rate is None
+    assert limiter.snapshot()['analyze']['rate_per_second'] is None
+
+
+def test_unconfigured_stage_is_not_limited():
+    limiter = StageRateLimiter({})
+    asyncio.run(limiter.acquire('build'))
+    assert limiter.waits == {}
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+import httpx
+
+from recording import StageRecorder, _read_members, load_recordings, summarize
+
+
+def make_response(path, body, status=200):
+    request = httpx.Request('POST', f'http://agent{path}', json={'domain': 'example.com'})
+    return httpx.Response(status, json=body, request=request)
+
+
+def record_job(recorder, job_id, stages=('analyze',)):
+    recorder.record_job({'id': job_id, 'domain': f'{job_id}.com', 'job_data': {'source': 'test'}})
+    for stage in stages:
+        recorder.record_stage(job_id, stage, make_response(f'/api/{stage}', {'success': True}), 0.25)
+    recorder.finish_job(job_id)
+
+
+def test_each_finished_job_is_its_own_gzip_member(tmp_path):
+    path = str(tmp_path / 'stages.ndjson.gz')
+    recorder = StageRecorder(path)
+    record_job(recorder, 'a', stages=('analyze', 'strategy'))
+    record_job(recorder, 'b')
+
+    members = list(_read_members(path))
+    assert len(members) == 2
+    assert [json.loads(line)['type'] for line in members[0].decode().splitlines()] == ['job', 'stage', 'stage']
+
+    recordings = load_recordings(path)
+    assert list(recordings) == ['a', 'b']
+    assert recordings['a']['job']['domain'] == 'a.com'
+    assert summarize(recordings)['stage_calls'] == {'analyze': 2, 'strategy': 1}
+
+
+def test_jobs_in_flight_are_written_on_close(tmp_path):
+    path = str(tmp_path / 'stages.ndjson.gz')
+    recorder = StageRecorder(path)
+    recorder.record_job({'id': 'running', 'domain': 'running.com'})
+    recorder.record_stage('running', 'analyze', make_response('/api/analyze', {}), 1.0)
+    assert not (tmp_path / 'stages.ndjson.gz').exists()
+
+    recorder.close()
+    assert len(load_recordings(path)['running']['stages']) == 1
+
+
+def test_truncated_last_member_keeps_earlier_jobs(tmp_path):
+    path = tmp_path / 'stages.ndjson.gz'
+    recorder = StageRecorder(str(path))
+    record_job(recorder, 'a')
+    record_job(recorder, 'b')
+    size_after_b = path.stat().st_size
+    record_job(recorder, 'c')
+
+    # A crash in the middle of writing job c
+    data = path.read_bytes()
+    path.write_bytes(data[:size_after_b + (len(data) - size_after_b) // 2])
+
+    assert list(load_recordings(str(path))) == ['a', 'b']
+
+
+def test_corrupt_member_is_skipped(tmp_path):
+    path = tmp_path / 'stages.ndjson.gz'
+    good = [gzip.compress(f'{{"type":"job","job_id":"{job}","domain":"{job}.com"}}\n'.encode()) for job in 'abc']
+    corrupt = bytearray(good[1])
+    corrupt[len(corrupt) // 2:] = b'\x00' * (len(corrupt) - len(corrupt) // 2)
+    path.write_bytes(good[0] + bytes(corrupt) + good[2])
+
+    assert list(load_recordings(str(path))) == ['a', 'c']
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from replay import diff_results, percentile, replay
+
+
+def test_diff_results_follows_each_metric_direction():
+    baseline = {'throughput_jobs_per_min': 10.0, 'job_latency': {'p95': 4.0}, 'memory': {'peak_rss_mb': 100.0}}
+    current = {'throughput_jobs_per_min': 8.0, 'job_latency': {'p95': 3.0}, 'memory': {'peak_rss_mb': 100.0}}
+
+    rows = {row['metric']: row for row in diff_results(baseline, current)}
+
+    assert set(rows) == {'throughput_jobs_per_min', 'job_latency.p95', 'memory.peak_rss_mb'}
+    assert rows['throughput_jobs_per_min']['regressed']
+    assert rows['throughput_jobs_per_min']['change_percent'] == -20.0
+    assert not rows['job_latency.p95']['regressed']
+    assert rows['job_latency.p95']['change_percent'] == -25.0
+    assert not rows['memory.peak_rss_mb']['regressed']
+
+
+def test_diff_results_with_zero_baseline():
+    rows = diff_results({'loop_lag': {'max_ms': 0.0}}, {'loop_lag': {'max_ms': 5.0}})
+    assert rows == [{'metric': 'loop_lag.max_ms', 'baseline': 0.0, 'current': 5.0,
+                     'change_percent': 0.0, 'regressed': True}]
+
+
+def test_percentile():
+    assert percentile([], 95) == 0.0
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def stage(path, data, latency=0.01):
+    return {'type': 'stage', 'path': path, 'status': 200, 'latency': latency,
+            'response': json.dumps({'success': True, 'data': data})}
+
+
+def make_recordings(count):
+    recordings = {}
+    for i in range(count):
+        job_id = f'job-{i}'
+        website_id = f'site-{i}'
+        recordings[job_id] = {
+            'job': {'type': 'job', 'job_id': job_id, 'domain': f'site{i}.com',
+                    'job_data': {'requestOrigin': 'http://agent'}},
+            'stages': [
+                stage('/api/analyze', {'bestDomain': {'domain': f'site{i}.com', 'score': 80}}),
+                stage('/api/strategy', {'businessModel': {'type': 'Shop'}}),
+                stage('/api/agents/design', {'layout': 'modern'}),
+                stage('/api/agents/content', {'hero': 'Hello'}),
+                stage('/api/generate-website', {'websiteId': website_id, 'deploymentUrl': f'https://site{i}.example'})
+            ],
+            'sites': [{'website_id': website_id, 'website_html': '<html><body> <p>hi</p> </body></html>',
+                       'website_css': 'a { color: red; }', 'website_js': 'var x = 1;'}]
+        }
+    return recordings
+
+
+def test_replay_runs_every_recorded_job(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+
+    results = asyncio.run(replay(make_recordings(3), scale=0, sample_interval=0.01))
+
+    assert results['jobs'] == 3
+    assert results['statuses'] == {'completed': 3}
+    assert results['unmatched_requests'] == 0
+    assert results['throughput_jobs_per_min'] > 0
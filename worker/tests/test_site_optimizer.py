@@ -0,0 +1,75 @@
+import gzip
+
+from site_optimizer import (CRITICAL_CSS_INLINE_BYTES, minify_css, minify_html, optimize_site,
+                            to_website_file_rows)
+
+
+def test_minify_html_keeps_a_space_between_body_elements():
+    html = '<div style="display:inline-block">a</div>\n   <div style="display:inline-block">b</div>'
+    assert minify_html(html) == '<div style="display:inline-block">a</div> <div style="display:inline-block">b</div>'
+
+
+def test_minify_html_drops_whitespace_around_head_tags_and_comments():
+    html = '''<html>
+      <head>
+        <meta charset="utf-8">
+        <title>Shop</title>
+      </head>
+      <body>
+        <!-- hero -->
+        <p>Hello   world</p>
+      </body>
+    </html>'''
+    assert minify_html(html) == '<html><head><meta charset="utf-8"><title>Shop</title></head><body><p>Hello world</p></body></html>'
+
+
+def test_minify_html_leaves_raw_blocks_alone():
+    html = '<pre>  keep\n  this  </pre>\n<textarea> a  b </textarea>'
+    assert minify_html(html) == html.replace('\n<textarea>', ' <textarea>')
+
+
+def test_minify_html_minifies_inline_styles():
+    assert minify_html('<style> a { color: red; } </style>') == '<style>a{color:red}</style>'
+
+
+def test_minify_css_keeps_strings_and_descendant_pseudo_selectors():
+    css = '/* note */ a :hover { content: "a  ;  b" ; }'
+    assert minify_css(css) == 'a :hover{content:"a  ;  b"}'
+
+
+def test_small_stylesheet_is_inlined_and_script_is_hashed():
+    html = '<html><head><link rel="stylesheet" href="styles.css"></head><body><script src="script.js"></script></body></html>'
+    result = optimize_site(html, 'a { color: red; }', 'var x = 1;  ' * 40)
+
+    names = {f['file_name'] for f in result['files']}
+    script_name = next(name for name in names if name.startswith('script.'))
+    assert names == {'index.html', script_name}
+
+    page = next(f for f in result['files'] if f['file_name'] == 'index.html' and f['content_encoding'] == 'identity')
+    assert b'<style>a{color:red}</style>' in page['content']
+    assert f'src="{script_name}"'.encode() in page['content']
+    assert page['cache_control'].startswith('public, max-age=0')
+
+
+def test_large_stylesheet_gets_a_hashed_file():
+    css = ''.join(f'.c{i} {{ color: #{i:06x}; }}\n' for i in range(CRITICAL_CSS_INLINE_BYTES // 10))
+    result = optimize_site('<link href="styles.css" rel="stylesheet">', css)
+
+    css_files = [f for f in result['files'] if f['file_type'] == 'css']
+    assert {f['content_encoding'] for f in css_files} >= {'identity', 'gzip'}
+    identity = next(f for f in css_files if f['content_encoding'] == 'identity')
+    assert identity['cache_control'].endswith('immutable')
+    gzipped = next(f for f in css_files if f['content_encoding'] == 'gzip')
+    assert gzip.decompress(gzipped['content']) == identity['content']
+    assert identity['file_name'] in result['manifest']['files']
+
+
+def test_website_file_rows_base64_encode_compressed_variants():
+    result = optimize_site('<p>' + 'x ' * 400 + '</p>')
+    rows = to_website_file_rows('site-1', result['files'])
+    identity = next(r for r in rows if r['content_encoding'] == 'identity')
+    compressed = next(r for r in rows if r['content_encoding'] == 'gzip')
+
+    assert identity['file_content'].startswith('<p>')
+    assert compressed['file_content'].isascii()
+    assert all(r['website_id'] == 'site-1' for r in rows)
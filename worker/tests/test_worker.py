@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from replay import MemorySupabase
+from main import SiteGenerationWorker
+from hedging import HedgePolicy
+
+
+@pytest.fixture
+def store():
+    return MemorySupabase()
+
+
+@pytest.fixture
+def worker(store, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('MAINTENANCE_ENABLED', 'false')
+    monkeypatch.delenv('RECORD_STAGES_PATH', raising=False)
+    return SiteGenerationWorker(supabase=store)
+
+
+def queue_job(store, job_id, **fields):
+    row = {'id': job_id, 'domain': f'{job_id}.com', 'status': 'queued', 'priority': 0,
+           'job_data': {}, 'created_at': datetime.now(timezone.utc).isoformat(), **fields}
+    store.tables['site_jobs'].append(row)
+    return row
+
+
+async def claim(worker):
+    job = await worker.claim_next_job()
+    worker.start_job(job)
+    return worker.in_flight[job['id']]
+
+
+def hang_jobs(worker, monkeypatch):
+    async def process_job(payload):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(worker, 'process_job', process_job)
+
+
+def test_shutdown_releases_jobs_left_after_drain_timeout(worker, store, monkeypatch):
+    row = queue_job(store, 'slow')
+    hang_jobs(worker, monkeypatch)
+    worker.drain_timeout = 0.05
+
+    async def run():
+        in_flight = await claim(worker)
+        await asyncio.sleep(0)
+        assert row['status'] == 'processing'
+        await worker.shutdown()
+        return in_flight
+
+    in_flight = asyncio.run(run())
+
+    assert in_flight.task.cancelled() or in_flight.task.done()
+    assert worker.in_flight == {}
+    assert not worker.is_running
+    assert row['status'] == 'queued'
+    assert row['worker_id'] is None
+
+
+def test_release_skips_jobs_no_longer_processing(worker, store, monkeypatch):
+    row = queue_job(store, 'cancelled')
+    hang_jobs(worker, monkeypatch)
+
+    async def run():
+        await claim(worker)
+        await asyncio.sleep(0)
+        row['status'] = 'cancelled'
+        await worker.release_in_flight()
+
+    asyncio.run(run())
+
+    assert row['status'] == 'cancelled'
+    assert worker.in_flight == {}
+
+
+@pytest.mark.parametrize('change', ['cancelled', 'deleted'])
+def test_watcher_cancels_cancelled_and_deleted_jobs(worker, store, monkeypatch, change):
+    row = queue_job(store, 'stopped')
+    other = queue_job(store, 'running')
+    hang_jobs(worker, monkeypatch)
+    worker.cancel_poll_interval = 0.01
+
+    async def run():
+        stopped = await claim(worker)
+        running = await claim(worker)
+        watcher = asyncio.create_task(worker.watch_cancellations())
+        if change == 'cancelled':
+            row['status'] = 'cancelled'
+        else:
+            store.tables['site_jobs'].remove(row)
+        await asyncio.sleep(0.05)
+        watcher.cancel()
+        return stopped, running
+
+    stopped, running = asyncio.run(run())
+
+    assert stopped.cancelled
+    assert 'stopped' not in worker.in_flight
+    assert not running.cancelled
+    assert other['status'] == 'processing'
+
+
+def test_backup_wins_keep_the_hedge_delay_stable(worker):
+    worker.hedging = HedgePolicy(stages='analyze', percentile=95, budget_percent=100, window=200,
+                                 min_samples=20, min_delay=0.0)
+    for _ in range(40):
+        worker.hedging.record('analyze', 0.02)
+    calls = 0
+
+    async def handler(request):
+        # Every primary hangs and every backup answers at once
+        nonlocal calls
+        calls += 1
+        if calls % 2:
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={'success': True})
+
+    worker.http_transport = httpx.MockTransport(handler)
+    initial_delay = worker.hedging.hedge_delay('analyze')
+
+    async def run():
+        for _ in range(30):
+            response = await worker.post_stage('analyze', 'http://agent/api/analyze', {}, timeout=2)
+            assert response.status_code == 200
+
+    asyncio.run(run())
+
+    assert worker.hedging.hedge_wins == 30
+    # Backup wins are recorded at their elapsed time, never at the 2s stage timeout
+    assert max(worker.hedging.latencies['analyze']) < 0.5
+    assert worker.hedging.hedge_delay('analyze') < 0.5
+    assert worker.hedging.hedge_delay('analyze') >= initial_delay